@@ -0,0 +1,6 @@
+"""DNA Matcher batch matching entry."""
+
+from dna_matcher.app import batch
+
+if __name__ == "__main__":
+    batch.main()
@@ -0,0 +1,4 @@
+"""Benchmarks of the loading, matching and rendering of samples.
+
+Usage: python -m benchmarks [loading] [matching] [rendering] -o out.json
+"""
@@ -0,0 +1,124 @@
+"""Command line entry of the benchmarks."""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from . import loading, matching, rendering
+
+BENCHMARKS = ("loading", "matching", "rendering")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Benchmark the loading, matching and rendering of "
+                    "samples.")
+    parser.add_argument("benchmarks", nargs="*",
+                        help="the benchmarks to run, among "
+                             f"{', '.join(BENCHMARKS)} (all by default)")
+    parser.add_argument("-o", "--output",
+                        help="the JSON file the results are written to")
+    parser.add_argument("--compare",
+                        help="a JSON file of earlier results to compare "
+                             "with")
+    parser.add_argument("--directory",
+                        default=os.path.join(tempfile.gettempdir(),
+                                             "dna_matcher_benchmarks"),
+                        help="where the synthetic samples are kept")
+    parser.add_argument("--sizes", nargs="+", default=loading.SIZES,
+                        help="sizes of the loaded samples, like 1k or 1g")
+    parser.add_argument("--lengths", nargs="+", type=int,
+                        default=matching.LENGTHS,
+                        help="lengths of the matched genomes")
+    parser.add_argument("--divergences", nargs="+", type=float,
+                        default=matching.DIVERGENCES)
+    parser.add_argument("--engines", nargs="+", default=None)
+    parser.add_argument("--frames", type=int, default=rendering.FRAMES)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+    for benchmark in args.benchmarks:
+        if benchmark not in BENCHMARKS:
+            parser.error(f"unknown benchmark: {benchmark}")
+    return args
+
+
+def revision() -> str:
+    """Returns the git commit being benchmarked, if known."""
+
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def key(result: dict) -> str:
+    return result["benchmark"] + json.dumps(result["params"], sort_keys=True)
+
+
+def compare(results: list, baseline: list):
+    """Prints how much faster (above 1) or slower each result is than
+    the same case of a baseline.
+    """
+
+    baseline = {key(result): result for result in baseline}
+    for result in results:
+        previous = baseline.get(key(result))
+        if previous is None:
+            continue
+        print(result["benchmark"], json.dumps(result["params"]),
+              f"{previous['seconds'] / result['seconds']:.2f}x", sep="\t")
+
+
+def main(argv=None) -> int:
+    """Runs the benchmarks.
+
+    Returns:
+        The exit status.
+    """
+
+    args = parse_args(argv)
+    os.makedirs(args.directory, exist_ok=True)
+    selected = args.benchmarks or BENCHMARKS
+
+    results = []
+    if "loading" in selected:
+        results.extend(loading.run(args.directory, args.sizes, args.repeat))
+    if "matching" in selected:
+        results.extend(matching.run(args.lengths, args.divergences,
+                                    args.engines, repeat=args.repeat))
+    if "rendering" in selected:
+        results.extend(rendering.run(args.directory, args.frames))
+
+    for result in results:
+        rate = result.get("bases_per_second") \
+            or result.get("frames_per_second")
+        unit = "bases/s" if "bases_per_second" in result else "frames/s"
+        print(result["benchmark"], json.dumps(result["params"]),
+              f"{rate:,.0f} {unit}", sep="\t")
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump({
+                "revision": revision(),
+                "date": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "python": sys.version,
+                "platform": platform.platform(),
+                "results": results
+            }, output_file, indent=2)
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            compare(results, json.load(baseline_file)["results"])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+"""Benchmark of the loading of samples."""
+
+import itertools
+
+from dna_matcher.app import sample
+from dna_matcher.app.sample import Sample
+
+from . import synthetic
+from .timing import best_time
+
+SIZES = ("1k", "1m", "100m")
+MODES = ("stream", "mmap")
+
+
+def run(directory: str, sizes=SIZES, repeat: int = 3) -> list:
+    """Times Sample.get_genome over synthetic samples of some sizes,
+    in every loading mode, as text and binary .moura files.
+
+    Args:
+
+        directory:
+            Where the synthetic samples are written. They are kept
+            for the following runs.
+
+        sizes:
+            The sizes of the samples, like "1k" or "1g".
+
+        repeat:
+            The amount of times each case is timed; the best time is
+            kept.
+
+    Returns:
+        A result dict per case.
+    """
+
+    results = []
+    for size in sizes:
+        length = synthetic.parse_size(size)
+        paths = {
+            "text": synthetic.write_sample(directory, length),
+            "binary": synthetic.write_binary_sample(directory, length)
+        }
+        for (sample_format, path), mode in itertools.product(
+                paths.items(), MODES):
+            def load():
+                # Mapped samples are remembered between loads, which
+                # would only time the first one.
+                sample._mapped_samples.clear()
+                Sample.get_genome(path, mode)
+
+            seconds = best_time(load, repeat)
+            params = {"bases": length, "mode": mode}
+            # Text cases keep the params of earlier results.
+            if sample_format != "text":
+                params["format"] = sample_format
+            results.append({
+                "benchmark": "loading",
+                "params": params,
+                "seconds": seconds,
+                "bases_per_second": length / seconds
+            })
+    return results
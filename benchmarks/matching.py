@@ -0,0 +1,67 @@
+"""Benchmark of the matching engines."""
+
+from dna_matcher.app import engine
+from dna_matcher.app.genome import PackedGenome
+from dna_matcher.app.sample import Sample
+
+from . import synthetic
+from .timing import best_time
+
+LENGTHS = (1_000, 10_000, 100_000)
+DIVERGENCES = (0.01, 0.1, 0.3)
+
+
+class _Sample:
+    """The part of a Sample used by Sample.match."""
+
+    def __init__(self, genome):
+        self.genome = genome
+
+
+def run(lengths=LENGTHS, divergences=DIVERGENCES, engines=None,
+        threshold: float = None, repeat: int = 3) -> list:
+    """Times Sample.match between random genomes and mutated copies.
+
+    Args:
+
+        lengths:
+            The lengths of the random genomes.
+
+        divergences:
+            The fractions of the bases of the copies that are edited.
+
+        engines:
+            The names of the engines timed. When None, all of them.
+
+        threshold:
+            Given to Sample.match.
+
+        repeat:
+            The amount of times each case is timed; the best time is
+            kept.
+
+    Returns:
+        A result dict per case.
+    """
+
+    results = []
+    for length in lengths:
+        bases = synthetic.random_bases(length)
+        sample1 = _Sample(PackedGenome.from_bases(bases))
+        for divergence in divergences:
+            sample2 = _Sample(PackedGenome.from_bases(
+                synthetic.mutate(bases, divergence)))
+            total = len(sample1.genome) + len(sample2.genome)
+            for engine_name in engines or sorted(engine.ENGINES):
+                seconds = best_time(
+                    lambda: Sample.match(sample1, sample2, engine_name,
+                                         threshold), repeat)
+                results.append({
+                    "benchmark": "matching",
+                    "params": {"bases": length, "divergence": divergence,
+                               "engine": engine_name,
+                               "threshold": threshold},
+                    "seconds": seconds,
+                    "bases_per_second": total / seconds
+                })
+    return results
@@ -0,0 +1,85 @@
+"""Benchmark of the rendering of the debug scene, run headless
+through the dummy video driver of SDL.
+"""
+
+import os
+import time
+
+FRAMES = 600
+SCREEN_SIZE = (1280, 768)
+SAMPLE_LENGTH = 1 << 20
+
+
+def run(directory: str, frames: int = FRAMES) -> list:
+    """Times DebugScene.draw and update with two samples loaded.
+
+    The helices are timed with and without dirty rects, and so is the
+    genome viewer.
+
+    Args:
+
+        directory:
+            Where the synthetic samples are written.
+
+        frames:
+            The amount of frames drawn per case.
+
+    Returns:
+        A result dict per case.
+    """
+
+    # SDL reads these when the display is initialised.
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+
+    import pygame
+
+    from dna_matcher import scene
+    from dna_matcher.app import dna
+
+    from . import synthetic
+
+    pygame.init()
+    # The game runs from the root of the repository, where game_data
+    # is.
+    working_directory = os.getcwd()
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    try:
+        screen = pygame.display.set_mode(SCREEN_SIZE)
+        paths = [synthetic.write_sample(directory, SAMPLE_LENGTH, seed)
+                 for seed in (1, 2)]
+        results = []
+        for viewing in (False, True):
+            for dirty_rects in (True, False):
+                debug_scene = scene.DebugScene(screen)
+                debug_scene.DIRTY_RECTS = dirty_rects
+                debug_scene.viewing = viewing
+                debug_scene.dna_samples = [
+                    dna.DNA(screen, x_boundaries, path, "mmap")
+                    for x_boundaries, path
+                    in zip(([100, 500], [784, 1127]), paths)
+                ]
+                start = time.perf_counter()
+                for frame in range(frames):
+                    pygame.event.pump()
+                    if viewing:
+                        # The viewers are scrolled every frame, which is
+                        # their worst case.
+                        for sample in debug_scene.dna_samples:
+                            sample.viewer.scroll(4)
+                    rects = debug_scene.draw()
+                    debug_scene.update()
+                    pygame.display.update(rects)
+                seconds = time.perf_counter() - start
+                results.append({
+                    "benchmark": "rendering",
+                    "params": {"view": "viewer" if viewing else "helix",
+                               "dirty_rects": dirty_rects,
+                               "frames": frames},
+                    "seconds": seconds,
+                    "frames_per_second": frames / seconds
+                })
+        return results
+    finally:
+        os.chdir(working_directory)
+        pygame.quit()
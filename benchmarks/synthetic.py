@@ -0,0 +1,84 @@
+"""Module for generating synthetic samples for the benchmarks."""
+
+import os
+import random
+
+BASES = b"ACGT"
+# Turns random bytes into bases.
+_TO_BASES = bytes(BASES[code % 4] for code in range(256))
+# Amount of bases written to a file at once.
+CHUNK_SIZE = 1 << 22
+
+SIZES = {"k": 1 << 10, "m": 1 << 20, "g": 1 << 30}
+
+
+def parse_size(text: str) -> int:
+    """Turns sizes like "1k", "10m" or "1g" into amounts of bases."""
+
+    text = text.lower()
+    if text[-1:] in SIZES:
+        return int(text[:-1]) * SIZES[text[-1]]
+    return int(text)
+
+
+def random_bases(length: int, seed: int = 0) -> bytes:
+    """Returns random bases, the same ones for the same seed."""
+
+    return random.Random(seed).randbytes(length).translate(_TO_BASES)
+
+
+def mutate(bases: bytes, divergence: float, seed: int = 0) -> bytes:
+    """Returns a copy of bases where a divergence fraction of the
+    positions were substituted, deleted or had a base inserted.
+    """
+
+    generator = random.Random(seed)
+    mutated = bytearray()
+    for base in bases:
+        if generator.random() >= divergence:
+            mutated.append(base)
+            continue
+        edit = generator.randrange(3)
+        if edit == 0:
+            mutated.append(generator.choice(BASES.replace(bytes([base]), b"")))
+        elif edit == 2:
+            mutated.append(base)
+            mutated.append(generator.choice(BASES))
+    return bytes(mutated)
+
+
+def write_sample(directory: str, length: int, seed: int = 0) -> str:
+    """Writes a .moura file of random bases, unless it exists.
+
+    Returns:
+        The path of the file.
+    """
+
+    path = os.path.join(directory, f"synthetic_{length}_{seed}.moura")
+    if os.path.exists(path) and os.path.getsize(path) == length:
+        return path
+    generator = random.Random(seed)
+    with open(path + ".tmp", "wb") as sample_file:
+        for start in range(0, length, CHUNK_SIZE):
+            size = min(CHUNK_SIZE, length - start)
+            sample_file.write(generator.randbytes(size).translate(_TO_BASES))
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def write_binary_sample(directory: str, length: int, seed: int = 0) -> str:
+    """Writes the sample of write_sample as a binary .moura file,
+    unless it exists.
+
+    Returns:
+        The path of the file.
+    """
+
+    from dna_matcher.convert import convert
+
+    text_path = write_sample(directory, length, seed)
+    path = os.path.join(directory, f"synthetic_{length}_{seed}.bin.moura")
+    if not os.path.exists(path) \
+            or os.path.getmtime(path) < os.path.getmtime(text_path):
+        convert(text_path, path)
+    return path
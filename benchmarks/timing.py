@@ -0,0 +1,18 @@
+"""Module for timing the benchmarks."""
+
+import time
+
+
+def best_time(function, repeat: int = 3) -> float:
+    """Returns the shortest time, in seconds, of repeat calls of a
+    function. It is called once more before, so lazy imports and
+    caches warming up are not timed.
+    """
+
+    function()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
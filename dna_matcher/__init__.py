@@ -1 +1,12 @@
-from .game import main
\ No newline at end of file
+import os
+import time
+
+
+def main() -> None:
+    """Runs the game. pygame is only imported here, so the headless
+    tools of the package can be used without it.
+    """
+
+    started = time.perf_counter()
+    from .game import main
+    main(started if os.environ.get("DNA_MATCHER_TIMING") else None)
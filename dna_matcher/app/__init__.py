@@ -1,2 +1,16 @@
-from .dna import DNA
-from .file_dialog import fd
\ No newline at end of file
+from .cache import SampleCache
+from .database import ReferenceDatabase
+from .file_dialog import choose_file, fd
+from .genome import MappedGenome, PackedGenome
+from .progress import CancelToken, Cancelled, Deadline
+from .sample import Sample
+from .sketch import Sketch
+
+
+def __getattr__(name):
+    # DNA draws with pygame, so it is only imported when it is used.
+    # That keeps the headless tools away from SDL.
+    if name == "DNA":
+        from .dna import DNA
+        return DNA
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,168 @@
+"""Module for aligning genomes, to show where they differ."""
+
+from . import engine
+
+# Below this amount of dynamic programming cells, the whole matrix is
+# kept and traced back, which is faster than splitting the problem.
+FULL_MATRIX_CELLS = 1 << 12
+
+MATCH = "="
+SUBSTITUTION = "X"
+INSERTION = "I"
+DELETION = "D"
+
+
+def _append(script: list, operation: str, length: int = 1):
+    if not length:
+        return
+    if script and script[-1][0] == operation:
+        script[-1] = (operation, script[-1][1] + length)
+    else:
+        script.append((operation, length))
+
+
+def _last_row(bases1: bytes, bases2: bytes, report=None) -> list:
+    """Returns the last row of the edit distance matrix of two
+    sequences, keeping a single row in memory.
+
+    An optional report function is called before each row with the
+    amount of cells of the previous one.
+    """
+
+    previous = list(range(len(bases2) + 1))
+    for i, base1 in enumerate(bases1, 1):
+        if report is not None:
+            report(len(bases2))
+        row = [i]
+        for j, base2 in enumerate(bases2, 1):
+            row.append(min(previous[j] + 1, row[j - 1] + 1,
+                           previous[j - 1] + (base1 != base2)))
+        previous = row
+    return previous
+
+
+def _full_matrix(bases1: bytes, bases2: bytes, script: list):
+    """Aligns two short sequences with the whole matrix."""
+
+    rows = [list(range(len(bases2) + 1))]
+    for i, base1 in enumerate(bases1, 1):
+        row = [i]
+        for j, base2 in enumerate(bases2, 1):
+            row.append(min(rows[-1][j] + 1, row[j - 1] + 1,
+                           rows[-1][j - 1] + (base1 != base2)))
+        rows.append(row)
+
+    operations = []
+    i, j = len(bases1), len(bases2)
+    while i or j:
+        if i and j and rows[i][j] == rows[i - 1][j - 1] \
+                + (bases1[i - 1] != bases2[j - 1]):
+            operations.append(MATCH if bases1[i - 1] == bases2[j - 1]
+                              else SUBSTITUTION)
+            i, j = i - 1, j - 1
+        elif i and rows[i][j] == rows[i - 1][j] + 1:
+            operations.append(DELETION)
+            i -= 1
+        else:
+            operations.append(INSERTION)
+            j -= 1
+    for operation in reversed(operations):
+        _append(script, operation)
+
+
+def _hirschberg(bases1: bytes, bases2: bytes, script: list, report=None):
+    if not bases1:
+        _append(script, INSERTION, len(bases2))
+    elif not bases2:
+        _append(script, DELETION, len(bases1))
+    elif len(bases1) == 1 or len(bases1) * len(bases2) <= FULL_MATRIX_CELLS:
+        if report is not None:
+            report(len(bases1) * len(bases2))
+        _full_matrix(bases1, bases2, script)
+    else:
+        middle = len(bases1) // 2
+        left = _last_row(bases1[:middle], bases2, report)
+        right = _last_row(bases1[middle:][::-1], bases2[::-1], report)
+        split = min(range(len(bases2) + 1),
+                    key=lambda j: left[j] + right[len(bases2) - j])
+        _hirschberg(bases1[:middle], bases2[:split], script, report)
+        _hirschberg(bases1[middle:], bases2[split:], script, report)
+
+
+def align(genome1, genome2, progress=None, cancel=None) -> list:
+    """Aligns two genomes with the smallest amount of edits.
+
+    It uses Hirschberg's divide and conquer, so only a couple of rows
+    of the dynamic programming matrix are kept at a time: the memory
+    used grows linearly with the genomes, not with their product. The
+    time grows with their product, though, about twice the cells of the
+    matrix in pure Python.
+
+    Args:
+
+        genome1, genome2:
+            The genomes to align.
+
+        progress:
+            An optional function called with the amount of cells
+            computed so far and an estimate of the total.
+
+        cancel:
+            An optional CancelToken, checked before each row of the
+            matrix.
+
+    Returns:
+        The edit script turning genome1 into genome2, as a list of
+        (operation, length) runs. The operations are MATCH,
+        SUBSTITUTION, INSERTION (a base only in genome2) and DELETION
+        (a base only in genome1).
+
+    Raises:
+        progress.Cancelled: if the alignment was cancelled.
+    """
+
+    script = []
+    report = None
+    if progress is not None or cancel is not None:
+        # Each level of the recursion computes about half the cells of
+        # the one above.
+        total = 2 * len(genome1) * len(genome2)
+        done = 0
+
+        def report(cells: int):
+            nonlocal done
+            done += cells
+            engine.report(progress, cancel, min(done, total), total)
+
+    _hirschberg(genome1.tobytes(), genome2.tobytes(), script, report)
+    return script
+
+
+def edit_distance(script: list) -> int:
+    """Returns the amount of edits of an edit script."""
+
+    return sum(length for operation, length in script
+               if operation != MATCH)
+
+
+def mismatches(script: list) -> tuple:
+    """Returns the positions that are not matched by an edit script.
+
+    Returns:
+        A tuple with the set of positions of genome1 and the set of
+        positions of genome2 that were substituted, deleted or
+        inserted.
+    """
+
+    positions1, positions2 = set(), set()
+    i = j = 0
+    for operation, length in script:
+        if operation in (SUBSTITUTION, DELETION):
+            positions1.update(range(i, i + length))
+        if operation in (SUBSTITUTION, INSERTION):
+            positions2.update(range(j, j + length))
+        if operation != INSERTION:
+            i += length
+        if operation != DELETION:
+            j += length
+    return positions1, positions2
@@ -0,0 +1,231 @@
+"""Module for matching many samples at once on every CPU core."""
+
+import argparse
+import concurrent.futures
+import math
+
+from . import engine
+from .genome import PackedGenome
+from .progress import Cancelled, Deadline
+from .sample import Sample
+
+CHUNK_SIZE = 64
+# Ratio given to the pairs that went over their time budget.
+TIMED_OUT = math.nan
+
+# Genomes of the chunk of pairs being matched in each worker process,
+# by index, set by _load.
+_genomes = {}
+
+
+class _Sample:
+    """The least a sample needs to be given to Sample.match."""
+
+    def __init__(self, genome, sketch=None):
+        self.genome = genome
+        self.sketch = sketch
+
+
+def _pack(genome) -> tuple:
+    """Returns the packed bytes, length and runs of unknown bases of a
+    genome, which is all a worker needs to rebuild it. Other genomes
+    are packed a chunk at a time, so a mapped sample is never read
+    into memory as ASCII.
+    """
+
+    if not isinstance(genome, PackedGenome) or genome.start % 4:
+        genome = PackedGenome.from_genome(genome)
+    return genome.view().tobytes(), len(genome), genome.gaps_between()
+
+
+def _chunk_sources(pairs, sources, sketches=None) -> dict:
+    """Returns the sources (see _load) of the genomes a chunk of pairs
+    needs, so no worker is sent the genomes of the whole batch.
+    """
+
+    return {
+        index: (sources[index],
+                None if sketches is None else sketches[index])
+        for index in sorted({index for pair in pairs for index in pair})
+    }
+
+
+def _load(sources: dict):
+    """Sets _genomes to the genomes of a chunk of pairs.
+
+    Genomes the previous chunk of the worker also needed are kept
+    rather than rebuilt; the others are dropped.
+
+    Args:
+
+        sources:
+            Maps the index of each genome to a (source, sketch) tuple.
+            The source is either the path of a sample, which is mapped
+            by the worker, or the tuple given by _pack.
+
+    Raises:
+        ValueError: if a sample is not valid.
+    """
+
+    global _genomes
+    genomes = {}
+    for index, (source, sketch) in sources.items():
+        if index in _genomes:
+            genomes[index] = _genomes[index]
+            continue
+        if isinstance(source, str):
+            genome = Sample.get_genome(source, "mmap")
+            if genome is None:
+                raise ValueError(f"{source} is not a DNA sample.")
+        else:
+            data, length, gaps = source
+            genome = PackedGenome(data, length, gaps=gaps)
+        genomes[index] = _Sample(genome, sketch)
+    _genomes = genomes
+
+
+def _match_chunk(pairs, sources, engine_name, threshold, time_budget):
+    _load(sources)
+    results = []
+    for i, j in pairs:
+        cancel = None if time_budget is None else Deadline(time_budget)
+        try:
+            ratio = Sample.match(_genomes[i], _genomes[j], engine_name,
+                                 threshold, cancel=cancel)
+        except Cancelled:
+            ratio = TIMED_OUT
+        results.append((i, j, ratio))
+    return results
+
+
+def _match(sources, pairs, workers, chunk_size, engine_name, threshold,
+           time_budget):
+    pairs = list(pairs)
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        futures = [
+            executor.submit(_match_chunk, chunk,
+                            _chunk_sources(chunk, sources), engine_name,
+                            threshold, time_budget)
+            for chunk in (pairs[start:start + chunk_size]
+                          for start in range(0, len(pairs), chunk_size))
+        ]
+        for future in concurrent.futures.as_completed(futures):
+            yield from future.result()
+
+
+def match_genomes(genomes, pairs, workers: int = None,
+                  chunk_size: int = CHUNK_SIZE, engine_name: str = None,
+                  threshold: float = None, time_budget: float = None):
+    """Matches pairs of genomes in a pool of processes.
+
+    The work is sent as chunks of index pairs, each one together with
+    the packed genomes its pairs need.
+
+    Args:
+
+        genomes:
+            The list of genomes to be matched.
+
+        pairs:
+            An iterable of (i, j) tuples, each one asking to match
+            genomes[i] with genomes[j].
+
+        workers:
+            The amount of processes. When None, one per CPU core.
+
+        chunk_size:
+            The amount of pairs given to a worker at once.
+
+        engine_name, threshold:
+            Given to Sample.match.
+
+        time_budget:
+            Optional amount of seconds a pair may take. Pairs going
+            over it get TIMED_OUT as ratio. Only engines checking their
+            CancelToken while matching (like "bitparallel") can be
+            stopped halfway.
+
+    Yields:
+        (i, j, ratio) tuples as soon as their chunk is done, so not
+        in the order of pairs.
+    """
+
+    return _match([_pack(genome) for genome in genomes], pairs, workers,
+                  chunk_size, engine_name, threshold, time_budget)
+
+
+def match_files(paths, pairs, workers: int = None,
+                chunk_size: int = CHUNK_SIZE, engine_name: str = None,
+                threshold: float = None, time_budget: float = None):
+    """Matches pairs of sample files like match_genomes.
+
+    The workers are sent the paths of the samples their pairs need and
+    map them, so the genomes are never copied between processes.
+
+    Raises:
+        ValueError: if one of the files is not a DNA sample.
+    """
+
+    for path in paths:
+        if Sample.get_genome(path, "mmap") is None:
+            raise ValueError(f"{path} is not a DNA sample.")
+    return _match(list(paths), pairs, workers, chunk_size, engine_name,
+                  threshold, time_budget)
+
+
+def main(argv=None):
+    """Command line entry of the batch matcher."""
+
+    parser = argparse.ArgumentParser(
+        description="Match DNA samples on every CPU core.")
+    parser.add_argument("samples", nargs="*",
+                        help="a query sample followed by the references "
+                             "it is matched against")
+    parser.add_argument("--pairs", metavar="FILE",
+                        help="file with two sample paths per line, "
+                             "matched instead of query and references")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--engine", default=None,
+                        choices=sorted(engine.ENGINES))
+    parser.add_argument("--threshold", type=float, default=None)
+    parser.add_argument("--time-budget", type=float, default=None,
+                        metavar="SECONDS",
+                        help="give up on pairs taking longer than this")
+    args = parser.parse_args(argv)
+
+    paths = []
+    pairs = []
+    if args.pairs:
+        positions = dict()
+        with open(args.pairs) as pairs_file:
+            for line in pairs_file:
+                if not line.strip():
+                    continue
+                pair = []
+                for path in line.split():
+                    if path not in positions:
+                        positions[path] = len(paths)
+                        paths.append(path)
+                    pair.append(positions[path])
+                if len(pair) != 2:
+                    parser.error(f"expected two samples per line: {line}")
+                pairs.append(tuple(pair))
+    elif len(args.samples) >= 2:
+        paths = args.samples
+        pairs = [(0, j) for j in range(1, len(paths))]
+    else:
+        parser.error("give a query and a reference, or --pairs")
+
+    results = match_files(paths, pairs, workers=args.workers,
+                          chunk_size=args.chunk_size,
+                          engine_name=args.engine, threshold=args.threshold,
+                          time_budget=args.time_budget)
+    for i, j, ratio in results:
+        if ratio is None:
+            ratio = "-"
+        elif math.isnan(ratio):
+            ratio = "timeout"
+        else:
+            ratio = f"{ratio:.4f}"
+        print(paths[i], paths[j], ratio, sep="\t", flush=True)
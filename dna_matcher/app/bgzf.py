@@ -0,0 +1,159 @@
+"""Module for reading BGZF (bgzip) files at any offset."""
+
+import bisect
+import collections
+import os
+import struct
+import threading
+import zlib
+
+# A gzip member whose header has the extra field flag set.
+BGZF_MAGIC = b"\x1f\x8b\x08\x04"
+# Amount of decompressed blocks kept for the next reads.
+MAX_CACHED_BLOCKS = 16
+
+_HEADER = struct.Struct("<4sIBBH")
+
+
+def block_size(header: bytes):
+    """Returns the size of the BGZF block starting with header, or None
+    if it is not the header of a BGZF block.
+
+    Args:
+
+        header:
+            The first bytes of the block, at least the fixed gzip
+            header and its extra field.
+    """
+
+    if len(header) < _HEADER.size or header[:4] != BGZF_MAGIC:
+        return None
+    extra_length = _HEADER.unpack_from(header)[4]
+    extra = header[_HEADER.size:_HEADER.size + extra_length]
+    # The extra field holds subfields; BGZF adds the BC one, with the
+    # size of the block minus one.
+    position = 0
+    while position + 4 <= len(extra):
+        identifier = extra[position:position + 2]
+        length, = struct.unpack_from("<H", extra, position + 2)
+        if identifier == b"BC" and length == 2:
+            return struct.unpack_from("<H", extra, position + 4)[0] + 1
+        position += 4 + length
+    return None
+
+
+class BgzfFile:
+    """A BGZF file, read as if it was decompressed.
+
+    BGZF is the gzip variant written by bgzip: a series of gzip members
+    of at most 64 KiB, each telling its own size. Only the headers and
+    trailers are read to index the blocks, so any range of the
+    decompressed data is read by inflating the few blocks holding it.
+    Slicing the file returns decompressed bytes, like slicing a mmap.
+    """
+
+    def __init__(self, path: str, max_cached_blocks: int = MAX_CACHED_BLOCKS):
+        """Initialises the BgzfFile object and indexes its blocks.
+
+        Args:
+
+            path:
+                Path to the BGZF file.
+
+            max_cached_blocks:
+                Amount of decompressed blocks kept in memory.
+
+        Raises:
+            ValueError: if the file is not a BGZF file.
+        """
+
+        self.path = path
+        self.file = open(path, "rb")
+        self.max_cached_blocks = max_cached_blocks
+        self.blocks = collections.OrderedDict()
+        # The helix is drawn while tasks read the same file.
+        self.lock = threading.Lock()
+        # Offsets of each block in the file and in the decompressed
+        # data, plus the end of both.
+        self.offsets = [0]
+        self.data_offsets = [0]
+        try:
+            self.index()
+        except ValueError:
+            self.file.close()
+            raise
+
+    def index(self):
+        """Reads the offsets of every block."""
+
+        descriptor = self.file.fileno()
+        size = os.fstat(descriptor).st_size
+        offset = 0
+        while offset < size:
+            length = block_size(os.pread(descriptor, 256, offset))
+            if length is None:
+                raise ValueError(f"{self.path} is not a BGZF file.")
+            # The trailer of a member ends with the size of its data.
+            trailer = os.pread(descriptor, 4, offset + length - 4)
+            if len(trailer) < 4:
+                raise ValueError(f"{self.path} is truncated.")
+            data_size, = struct.unpack("<I", trailer)
+            offset += length
+            if data_size:
+                self.offsets.append(offset)
+                self.data_offsets.append(self.data_offsets[-1] + data_size)
+            else:
+                # Empty blocks, like the end of file marker, are
+                # skipped by moving the start of the next block.
+                self.offsets[-1] = offset
+
+    def __len__(self):
+        return self.data_offsets[-1]
+
+    def block(self, index: int) -> bytes:
+        """Returns the decompressed data of a block."""
+
+        with self.lock:
+            if index in self.blocks:
+                self.blocks.move_to_end(index)
+                return self.blocks[index]
+        first, last = self.offsets[index], self.offsets[index + 1]
+        member = os.pread(self.file.fileno(), last - first, first)
+        data = zlib.decompressobj(31).decompress(member)
+        with self.lock:
+            self.blocks[index] = data
+            if len(self.blocks) > self.max_cached_blocks:
+                self.blocks.popitem(last=False)
+        return data
+
+    def read(self, offset: int, size: int) -> bytes:
+        """Returns size bytes of the decompressed data from offset."""
+
+        stop = min(offset + size, len(self))
+        if offset >= stop:
+            return b""
+        index = bisect.bisect_right(self.data_offsets, offset) - 1
+        parts = []
+        while offset < stop:
+            data = self.block(index)
+            first = offset - self.data_offsets[index]
+            part = data[first:first + stop - offset]
+            parts.append(part)
+            offset += len(part)
+            index += 1
+        return b"".join(parts)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            data = self.read(start, max(stop - start, 0))
+            return data if step == 1 else data[::step]
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("BGZF offset out of range")
+        return self.read(key, 1)[0]
+
+    def close(self):
+        self.file.close()
+        self.blocks.clear()
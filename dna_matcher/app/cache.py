@@ -0,0 +1,180 @@
+"""Module for the on-disk cache of preprocessed samples."""
+
+import hashlib
+import os
+import pickle
+
+from .genome import PackedGenome
+from .sketch import KMER_SIZE, SKETCH_SIZE, Sketch
+
+CHUNK_SIZE = 1 << 20
+# Bumped every time the layout of the entries changes.
+CACHE_VERSION = 3
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+
+
+def default_directory() -> str:
+    """Returns the directory used by default for the cache."""
+
+    root = os.environ.get("XDG_CACHE_HOME",
+                          os.path.join(os.path.expanduser("~"), ".cache"))
+    return os.path.join(root, "dna_matcher")
+
+
+def content_key(filename: str) -> str:
+    """Returns the SHA-256 of the contents of a file, as hex."""
+
+    digest = hashlib.sha256()
+    with open(filename, "rb") as sample:
+        while chunk := sample.read(CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class SampleCache:
+    """A directory storing what was derived from each sample: its
+    packed genome, sketch and summary stats. The genome of mapped
+    samples is not stored, as mapping it again is cheaper than reading
+    a copy of it.
+
+    Entries are keyed by a hash of the sample contents, so a changed
+    file simply misses the cache. When the entries take more than
+    max_size bytes, the least recently used ones are deleted.
+    """
+
+    def __init__(self, directory: str = None,
+                 max_size: int = DEFAULT_MAX_SIZE):
+        """Initialises the SampleCache object.
+
+        Args:
+
+            directory:
+                Where the entries are stored. When None,
+                default_directory() is used.
+
+            max_size:
+                Maximum amount of bytes used by the entries.
+        """
+
+        self.directory = default_directory() if directory is None \
+            else directory
+        self.max_size = max_size
+        # Content hashes of the files already hashed, keyed by their
+        # path, inode, size and modification time.
+        self.hashes = dict()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, filename: str) -> str:
+        """Returns the content hash of a sample file."""
+
+        stat = os.stat(filename)
+        stat_key = (os.path.abspath(filename), stat.st_ino, stat.st_size,
+                    stat.st_mtime_ns)
+        if stat_key not in self.hashes:
+            self.hashes[stat_key] = content_key(filename)
+        return self.hashes[stat_key]
+
+    def path(self, key: str) -> str:
+        """Returns the path of the entry of a key."""
+
+        return os.path.join(self.directory, key + ".sample")
+
+    def get(self, key: str):
+        """Returns the cached (genome, sketch, stats) of a sample, or
+        None when the sample is not cached. The genome is None when it
+        was not stored and the sketch is None when the sample was not
+        sketched yet.
+        """
+
+        entry = self.read(key)
+        if entry is None:
+            return None
+
+        # The modification time tells which entries were used last.
+        os.utime(self.path(key))
+        genome = None
+        if entry["packed"] is not None:
+            genome = PackedGenome(bytearray(entry["packed"]),
+                                  entry["length"], gaps=entry["gaps"])
+        sketch = None
+        if entry["hashes"] is not None:
+            sketch = Sketch(entry["hashes"], entry["kmer_size"],
+                            entry["sketch_size"])
+        return genome, sketch, entry["stats"]
+
+    def read(self, key: str):
+        """Returns the entry of a key, or None when it is missing or was
+        written with other settings.
+        """
+
+        try:
+            with open(self.path(key), "rb") as entry_file:
+                entry = pickle.load(entry_file)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        if entry.get("version") != CACHE_VERSION \
+                or entry["kmer_size"] != KMER_SIZE \
+                or entry["sketch_size"] != SKETCH_SIZE:
+            return None
+        return entry
+
+    def put(self, key: str, genome, sketch, stats: dict):
+        """Stores what was derived from a sample. The genome may be None
+        to store the rest only, and the sketch may be None and added
+        later with put_sketch.
+        """
+
+        packed = gaps = None
+        if genome is not None:
+            if not isinstance(genome, PackedGenome) or genome.start % 4:
+                genome = PackedGenome.from_genome(genome, CHUNK_SIZE)
+            packed, gaps = genome.view().tobytes(), genome.gaps_between()
+        self.write(key, {
+            "version": CACHE_VERSION,
+            "length": stats["length"],
+            "packed": packed,
+            "gaps": gaps,
+            "kmer_size": KMER_SIZE,
+            "sketch_size": SKETCH_SIZE,
+            "hashes": None if sketch is None else sketch.hashes,
+            "stats": stats
+        })
+
+    def put_sketch(self, key: str, sketch):
+        """Adds the sketch of a sample to its entry, if it is cached."""
+
+        entry = self.read(key)
+        if entry is None or sketch.kmer_size != KMER_SIZE \
+                or sketch.size != SKETCH_SIZE:
+            return
+        entry["hashes"] = sketch.hashes
+        self.write(key, entry)
+
+    def write(self, key: str, entry: dict):
+        """Replaces the entry of a key at once."""
+
+        path = self.path(key)
+        temporary = path + f".{os.getpid()}.tmp"
+        with open(temporary, "wb") as entry_file:
+            pickle.dump(entry, entry_file, pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+        self.evict()
+
+    def evict(self):
+        """Deletes the least recently used entries until the cache
+        fits in max_size.
+        """
+
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".sample"):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+        entries.sort()
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in entries:
+            if total <= self.max_size:
+                break
+            os.remove(os.path.join(self.directory, name))
+            total -= size
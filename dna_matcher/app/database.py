@@ -0,0 +1,172 @@
+"""Module for searching a sample in a database of reference samples."""
+
+import collections
+import os
+
+from . import readers
+from .sample import Sample
+
+# Amount of candidates matched exactly by default on each query.
+SHORTLIST_SIZE = 20
+
+
+class Reference:
+    """A sample of a reference database.
+
+    Only its sketch and stats are kept in memory; the genome is mapped
+    the first time it is needed.
+    """
+
+    def __init__(self, sample_id: int, path: str, sketch, stats: dict):
+        """Initialises the Reference object.
+
+        Args:
+
+            sample_id:
+                The position of the reference in its database.
+
+            path:
+                The path of the sample file.
+
+            sketch, stats:
+                The sketch and summary stats of the sample.
+        """
+
+        self.sample_id = sample_id
+        self.path = path
+        self.name = os.path.basename(path)
+        self.sketch = sketch
+        self.stats = stats
+        self._genome = None
+
+    @property
+    def genome(self):
+        """The genome of the reference, mapped on first use."""
+
+        if self._genome is None:
+            self._genome = Sample.get_genome(self.path, "mmap")
+        return self._genome
+
+
+class ReferenceDatabase:
+    """An index of every sample of a directory.
+
+    Each hash of the sketch of a reference points to the references
+    containing it (a posting list). A query only looks at the posting
+    lists of its own hashes to find the references sharing k-mers with
+    it, and only those are matched exactly.
+    """
+
+    def __init__(self, directory: str, cache=None):
+        """Initialises the ReferenceDatabase object and indexes the
+        samples of the directory.
+
+        Args:
+
+            directory:
+                The directory containing the references. Its files
+                are taken as samples by their extension (see
+                readers.is_sample_file).
+
+            cache:
+                An optional SampleCache used when loading the
+                references.
+        """
+
+        self.directory = directory
+        self.cache = cache
+        self.references = []
+        self.index = collections.defaultdict(list)
+
+        for name in sorted(os.listdir(directory)):
+            if readers.is_sample_file(name):
+                self.add(os.path.join(directory, name))
+
+    def add(self, path: str) -> Reference:
+        """Indexes a sample file.
+
+        Returns:
+            The new Reference, or None if the file is not a valid DNA
+            sample.
+        """
+
+        try:
+            sample = Sample(path, "mmap", self.cache)
+        except ValueError:
+            return None
+        reference = Reference(len(self.references), path, sample.sketch,
+                              sample.stats)
+        self.references.append(reference)
+        for value in reference.sketch.hashes:
+            self.index[value].append(reference.sample_id)
+        return reference
+
+    def candidates(self, sample, shortlist: int = SHORTLIST_SIZE) -> list:
+        """Returns the references sharing most k-mers with a sample.
+
+        Short or divergent samples may share no k-mer of their sketches
+        with references that still match them, so when too few
+        references share any, the shortlist is filled with the others,
+        by the best ratio their lengths allow (see Sample.match: the
+        ratio is at most 1 - |n - m| / (n + m)).
+
+        Args:
+
+            sample:
+                Any object with genome and sketch attributes, like
+                Sample.
+
+            shortlist:
+                The maximum amount of candidates returned.
+        """
+
+        hits = collections.Counter()
+        for value in sample.sketch.hashes:
+            hits.update(self.index.get(value, ()))
+        candidates = [self.references[sample_id]
+                      for sample_id, _ in hits.most_common(shortlist)]
+        if len(candidates) < shortlist:
+            length = len(sample.genome)
+
+            def length_bound(reference) -> float:
+                total = length + reference.stats["length"]
+                return abs(length - reference.stats["length"]) / total \
+                    if total else 0.0
+
+            others = sorted((reference for reference in self.references
+                             if reference.sample_id not in hits),
+                            key=length_bound)
+            candidates += others[:shortlist - len(candidates)]
+        return candidates
+
+    def query(self, sample, top: int = 5, shortlist: int = SHORTLIST_SIZE,
+              engine_name: str = None) -> list:
+        """Finds the references most similar to a sample.
+
+        Args:
+
+            sample:
+                Any object with genome and sketch attributes, like Sample.
+
+            top:
+                The maximum amount of matches returned.
+
+            shortlist:
+                The amount of candidates matched exactly.
+
+            engine_name:
+                The matching engine given to Sample.match.
+
+        Returns:
+            A list of (ratio, Reference) tuples, best match first.
+        """
+
+        matches = [
+            (Sample.match(sample, reference, engine_name), reference)
+            for reference in self.candidates(sample, shortlist)
+        ]
+        matches.sort(key=lambda match: match[0], reverse=True)
+        return matches[:top]
+
+    def __len__(self):
+        return len(self.references)
@@ -1,83 +1,302 @@
-"""Module for dna analysis related class and functions."""
+"""Module for drawing DNA samples."""
 
-import Levenshtein as lv
+import array
+
+import pygame.constants as constants
 import pygame.draw as draw
+import pygame.rect as rect
+import pygame.surface as surface
+
+from .genome import BASES
+from .sample import Sample
+from .summary import SummaryPyramid
+
+# Amount of bases shown by the helix.
+DISPLAY_WINDOW = 20
+MISMATCH_COLOUR = (235, 52, 52)
+# Vertical distance between the rungs of a helix that is not crowded.
+RUNG_SPACING = 25
+
+
+class DNA(Sample):
+    """DNA class. A sample drawn as a helix on the screen.
+
+    The helix shows a window of the genome, one rung per base, which
+    can be scrolled along the whole genome.
+    """
 
+    def __init__(self, screen, x_boundaries, file: str, mode: str = "stream",
+                 cache=None, progress=None, cancel=None,
+                 rungs: int = DISPLAY_WINDOW):
+        """Initialises the DNA object.
 
-class DNA:
-    """DNA class."""
+        Args:
+
+            screen:
+                The Surface object where the helix is drawn.
+
+            x_boundaries:
+                The leftmost and rightmost x of the helix.
+
+            file, mode, cache, progress, cancel:
+                Given to Sample.
+
+            rungs:
+                The amount of bases shown at once.
+        """
 
-    def __init__(self, screen, x_boundaries, file: str):
         self.screen = screen
         self.screen_rect = screen.get_rect()
+        super().__init__(file, mode, cache, progress, cancel)
         # ex. 67, 548
-        self.genome = DNA.get_genome(file)
         self.colour_map = {
             "G": (73, 52, 235),
             "A": (52, 235, 52),
             "T": (147, 52, 235),
             "C": (208, 235, 52)
         }
-        if self.genome is None:
-            raise ValueError(f"{file} is not a DNA sample.")
+        self.rungs = rungs
+        # Position of the first shown base in the genome.
+        self.offset = 0
+        self.window = str(self.genome[:rungs])
+        # Positions of the genome that differ from the sample it was
+        # last aligned with. Their rungs are drawn in red.
+        self.mismatches = set()
 
-        # TODO: Calculate how many balls, their y distance from each other
         self.x_boundaries = x_boundaries
         self.middle_point = sum(x_boundaries) // 2
         self.y_boundaries = (40, 590)
-        self.circles = []
-        self.lines = []
-        y_row = self.y_boundaries[0]
+        spacing = min(RUNG_SPACING,
+                      (self.y_boundaries[1] - self.y_boundaries[0]) / rungs)
+        self.radius = max(1, round(spacing * 0.4))
+        self.line_width = max(1, round(spacing * 0.12))
+
+        # Only the left circle of each rung is kept: the right one
+        # mirrors it around the middle of the helix.
+        self.rows = array.array("i", (
+            round(self.y_boundaries[0] + i * spacing) for i in range(rungs)))
+        self.positions = array.array("i")
         approximity = 0
         approximity_factor = 30
-        for i in range(20):
-            circle_pair = []
-            line_par_points = []
-
-            circle_pair.append([self.x_boundaries[0] + approximity, y_row])
-            circle_pair.append([self.x_boundaries[1] - approximity, y_row])
+        for i in range(rungs):
+            self.positions.append(self.x_boundaries[0] + approximity)
+            approximity += approximity_factor
+            if approximity >= 300 or approximity <= 0:
+                approximity_factor *= -1
+        self.speeds = array.array("i", [10] * rungs)
 
-            # line_par_points.append([self.x_boundaries[0], y_row])
-            # line_par_points.append([self.x_boundaries[1], y_row])
-            line_par_points.append(circle_pair[0])
-            line_par_points.append(circle_pair[1])
+        # Area where the helix may be drawn: the circles overshoot the
+        # boundaries by up to a step before bouncing back.
+        margin = self.radius + max(self.speeds, default=0)
+        self.rect = rect.Rect(
+            self.x_boundaries[0] - margin, self.y_boundaries[0] - margin,
+            self.x_boundaries[1] - self.x_boundaries[0] + 2 * margin,
+            self.rows[-1] - self.y_boundaries[0] + 2 * margin
+            if rungs else 0)
 
-            self.circles.append(circle_pair)
-            self.lines.append(line_par_points)
+        # Sprites blitted by draw: a circle and a bar per colour, the
+        # rungs being slices of the bars.
+        self.circle = surface.Surface((2 * self.radius, 2 * self.radius),
+                                      constants.SRCALPHA)
+        draw.circle(self.circle, (255, 255, 255),
+                    (self.radius, self.radius), self.radius)
+        bar_size = (self.rect.width, self.line_width)
+        self.bars = dict()
+        for colour in list(self.colour_map.values()) + [MISMATCH_COLOUR]:
+            self.bars[colour] = surface.Surface(bar_size)
+            self.bars[colour].fill(colour)
 
-            y_row += 25
+        # The helix can be swapped for a strip showing the whole
+        # genome, drawn from its summary when zoomed out. The summary
+        # is only built then, so loading never reads the whole genome
+        # for it.
+        self.viewer = GenomeViewer(
+            screen, (self.x_boundaries[0] - 80, 250,
+                     self.x_boundaries[1] - self.x_boundaries[0] + 160, 100),
+            self.genome, None, self.colour_map)
 
-            approximity += approximity_factor
-            if approximity >= 300 or approximity <= 0:
-                approximity_factor *= -1
+    def scroll(self, amount: int):
+        """Moves the shown window amount bases along the genome."""
 
-        self.speeds = [[10, 10] for i in range(len(self.circles))]
+        last = max(0, len(self.genome) - self.rungs)
+        offset = min(max(0, self.offset + amount), last)
+        if offset != self.offset:
+            self.offset = offset
+            self.window = str(self.genome[offset:offset + self.rungs])
 
     def draw(self):
-        for circle_pair, line_points, code in zip(self.circles, self.lines, self.genome):
-            draw.line(self.screen, self.colour_map.get(code), line_points[0], line_points[1], width=3)
-            draw.circle(self.screen, (255, 255, 255), circle_pair[0], 10)
-            draw.circle(self.screen, (255, 255, 255), circle_pair[1], 10)
-    
+        mirror = self.x_boundaries[0] + self.x_boundaries[1]
+        half_line = self.line_width // 2
+        sprites = []
+        for i, (x, y, code) in enumerate(
+                zip(self.positions, self.rows, self.window)):
+            colour = MISMATCH_COLOUR if i + self.offset in self.mismatches \
+                else self.colour_map.get(code)
+            left, right = sorted((x, mirror - x))
+            bar = self.bars.get(colour)
+            if bar is not None:
+                sprites.append((bar, (left, y - half_line),
+                                (0, 0, right - left + 1, self.line_width)))
+        sprites.extend((self.circle, (x - self.radius, y - self.radius))
+                       for x, y in zip(self.positions, self.rows))
+        sprites.extend((self.circle, (mirror - x - self.radius,
+                                      y - self.radius))
+                       for x, y in zip(self.positions, self.rows))
+        self.screen.blits(sprites, False)
+
     def update(self):
-        for circle_pair, speed_pair in zip(self.circles, self.speeds):
-            circle_pair[0][0] += speed_pair[0]
-            circle_pair[1][0] -= speed_pair[1]
-
-            # Checking collisions with invisible wall: circle 1
-            if circle_pair[0][0] <= self.x_boundaries[0] or circle_pair[0][0] >= self.x_boundaries[1]:
-                speed_pair[0] *= -1
-            # Checking collisions with invisible wall: circle 2
-            if circle_pair[1][0] <= self.x_boundaries[0] or circle_pair[1][0] >= self.x_boundaries[1]:
-                speed_pair[1] *= -1
-
-    @staticmethod
-    def get_genome(filename: str) -> str:
-        if ".moura" not in filename:
-            return None
-        with open(filename, "r") as dna_sample:
-            return dna_sample.read()[:20]
-
-    @staticmethod
-    def match(sample1, sample2) -> float:
-        return lv.ratio(sample1.genome, sample2.genome)
+        low, high = self.x_boundaries
+        self.positions = array.array("i", map(
+            int.__add__, self.positions, self.speeds))
+        # Circles that reached a boundary bounce back.
+        self.speeds = array.array("i", [
+            -speed if position <= low or position >= high else speed
+            for position, speed in zip(self.positions, self.speeds)
+        ])
+
+
+class GenomeViewer:
+    """A scrollable and zoomable strip showing a genome.
+
+    Only the bases inside the strip are read. When the strip is zoomed
+    out past BASES_LIMIT bases per pixel, it is drawn from the tiles of
+    a SummaryPyramid instead: each column gets the colours of its bases
+    mixed by frequency, and a band under it shows the GC content.
+    """
+
+    # Widest zoom, in pixels per base.
+    MAX_PIXELS_PER_BASE = 16
+    # Above this amount of bases per pixel, the summary is drawn.
+    BASES_LIMIT = 16
+    GC_BAND_HEIGHT = 12
+    BACKGROUND_COLOUR = (20, 20, 20)
+
+    def __init__(self, screen, area, genome, summary, colour_map: dict):
+        """Initialises the GenomeViewer object.
+
+        Args:
+
+            screen:
+                The Surface object where the viewer is drawn.
+
+            area:
+                The rect of the screen taken by the viewer.
+
+            genome:
+                The genome shown.
+
+            summary:
+                The SummaryPyramid of the genome. When None, it is
+                built the first time the viewer is zoomed out enough
+                to need it.
+
+            colour_map:
+                The colour of each base, by its letter.
+        """
+
+        self.screen = screen
+        self.rect = rect.Rect(area)
+        self.genome = genome
+        self._summary = summary
+        self.colours = [colour_map[chr(base)] for base in BASES]
+        # The first base shown, and the zoom level.
+        self.start = 0.0
+        self.bases_per_pixel = 1 / self.MAX_PIXELS_PER_BASE
+        self.image = surface.Surface(self.rect.size)
+        self.drawn = None
+
+    @property
+    def summary(self) -> SummaryPyramid:
+        """The SummaryPyramid of the genome, built on first use."""
+
+        if self._summary is None:
+            self._summary = SummaryPyramid.from_genome(self.genome)
+        return self._summary
+
+    @property
+    def max_bases_per_pixel(self) -> float:
+        return max(len(self.genome) / self.rect.width,
+                   1 / self.MAX_PIXELS_PER_BASE)
+
+    @property
+    def look(self) -> tuple:
+        """What the viewer shows; it changes when it is scrolled or
+        zoomed.
+        """
+
+        return (int(self.start), self.bases_per_pixel)
+
+    def scroll(self, pixels: float):
+        """Scrolls the viewer by an amount of pixels."""
+
+        last = max(0.0, len(self.genome)
+                   - self.rect.width * self.bases_per_pixel)
+        self.start = min(max(0.0, self.start
+                             + pixels * self.bases_per_pixel), last)
+
+    def zoom(self, factor: float, x: int = None):
+        """Zooms the viewer in (factor above 1) or out, keeping the base
+        under the x coordinate x of the screen in place.
+        """
+
+        x = self.rect.centerx if x is None else x
+        anchor = self.start + (x - self.rect.x) * self.bases_per_pixel
+        self.bases_per_pixel = min(
+            max(self.bases_per_pixel / factor, 1 / self.MAX_PIXELS_PER_BASE),
+            self.max_bases_per_pixel)
+        self.start = anchor - (x - self.rect.x) * self.bases_per_pixel
+        self.scroll(0)
+
+    def render(self):
+        """Draws the visible window in the image of the viewer."""
+
+        self.image.fill(self.BACKGROUND_COLOUR)
+        width, height = self.rect.size
+        bases_height = height - self.GC_BAND_HEIGHT
+        start = int(self.start)
+        if self.bases_per_pixel < 1:
+            # Zoomed in: every base gets a column of its own.
+            stop = min(len(self.genome),
+                       int(self.start + width * self.bases_per_pixel) + 1)
+            bases = self.genome.tobytes(start, stop)
+            for i, base in enumerate(bases):
+                if base in BASES:
+                    x = int((start + i - self.start) / self.bases_per_pixel)
+                    self.image.fill(
+                        self.colours[BASES.index(base)],
+                        (x, 0, int(1 / self.bases_per_pixel) + 1,
+                         bases_height))
+            return
+
+        level = None if self.bases_per_pixel <= self.BASES_LIMIT \
+            else self.summary.level_for(self.bases_per_pixel)
+        stop = min(len(self.genome),
+                   int(self.start + width * self.bases_per_pixel) + 1)
+        bases = self.genome.tobytes(start, stop) if level is None else None
+        for x in range(width):
+            first = int(self.start + x * self.bases_per_pixel)
+            last = min(int(self.start + (x + 1) * self.bases_per_pixel),
+                       len(self.genome))
+            if first >= last:
+                break
+            if level is None:
+                column = bases[first - start:last - start]
+                counts = [column.count(base) for base in BASES]
+            else:
+                counts = self.summary.counts(level, first, last)
+            total = sum(counts)
+            if not total:
+                continue
+            colour = [sum(count * colour[channel] for count, colour
+                          in zip(counts, self.colours)) // total
+                      for channel in range(3)]
+            self.image.fill(colour, (x, 0, 1, bases_height))
+            gc = (counts[1] + counts[2]) * 255 // total
+            self.image.fill((gc, gc, gc),
+                            (x, bases_height, 1, self.GC_BAND_HEIGHT))
+
+    def draw(self):
+        if self.drawn != self.look:
+            self.render()
+            self.drawn = self.look
+        self.screen.blit(self.image, self.rect)
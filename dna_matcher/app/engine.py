@@ -0,0 +1,314 @@
+"""Module with the engines used to compare genomes."""
+
+import abc
+
+from .genome import BASES, UNKNOWN
+
+# Amount of rows of the dynamic programming matrix computed between
+# two progress reports (and cancellation checks).
+PROGRESS_ROWS = 1 << 12
+
+# Tables turning ASCII bases into "1" where they match a base and "0"
+# elsewhere. Unknown bases match each other, like in Levenshtein.
+_INDICATORS = {
+    base: bytes(ord("1") if code == base else ord("0") for code in range(256))
+    for base in BASES + UNKNOWN
+}
+
+
+def report(progress, cancel, done: int, total: int):
+    """Checks the CancelToken of a comparison and reports its
+    progress. Either may be None.
+    """
+
+    if cancel is not None:
+        cancel.check()
+    if progress is not None:
+        progress(done, total)
+
+
+class MatchEngine(abc.ABC):
+    """Base for matching engines.
+
+    An engine compares two genomes (any object with len and
+    iter_chunks, like PackedGenome and MappedGenome).
+
+    Every comparison takes two optional arguments: progress, a
+    function called with the amount of rows done and the amount of
+    rows, and cancel, a CancelToken that makes the comparison raise
+    Cancelled. Both are used every PROGRESS_ROWS rows; engines that
+    cannot be interrupted only use them before and after comparing.
+    """
+
+    name = None
+
+    @abc.abstractmethod
+    def ratio(self, genome1, genome2, progress=None, cancel=None) -> float:
+        """Returns the similarity of two genomes, from 0 to 1.
+
+        The ratio is the same given by Levenshtein.ratio: one minus
+        the indel distance (insertions and deletions only) divided by
+        the sum of the lengths.
+        """
+
+    @abc.abstractmethod
+    def distance(self, genome1, genome2, progress=None, cancel=None) -> int:
+        """Returns the Levenshtein distance between two genomes."""
+
+    def bounded_distance(self, genome1, genome2, max_distance: int,
+                         progress=None, cancel=None):
+        """Returns the indel distance between two genomes if it is at
+        most max_distance.
+
+        Only the cells of the dynamic programming matrix within
+        max_distance of the diagonal are computed, so it takes
+        O(max_distance * n) time. The computation stops as soon as
+        every cell of a row is above max_distance.
+
+        Returns:
+            The indel distance, or None when it is above max_distance.
+        """
+
+        if len(genome1) <= len(genome2):
+            pattern, text = genome1.tobytes(), genome2.tobytes()
+        else:
+            pattern, text = genome2.tobytes(), genome1.tobytes()
+        if len(text) - len(pattern) > max_distance:
+            return None
+
+        above = max_distance + 1
+        previous = list(range(min(len(text), max_distance) + 1))
+        previous_first = 0
+        for i, base in enumerate(pattern, 1):
+            if i % PROGRESS_ROWS == 0:
+                report(progress, cancel, i, len(pattern))
+            first = max(0, i - max_distance)
+            last = min(len(text), i + max_distance)
+            row = []
+            left = above
+            for j in range(first, last + 1):
+                k = j - previous_first
+                up = previous[k] if 0 <= k < len(previous) else above
+                if j == 0:
+                    cell = i
+                elif base == text[j - 1] and 0 < k <= len(previous):
+                    cell = previous[k - 1]
+                else:
+                    cell = min(up, left) + 1
+                left = min(cell, above)
+                row.append(left)
+            if min(row) > max_distance:
+                return None
+            previous, previous_first = row, first
+
+        report(progress, None, len(pattern), len(pattern))
+        distance = previous[len(text) - previous_first]
+        return distance if distance <= max_distance else None
+
+
+class LevenshteinEngine(MatchEngine):
+    """Engine backed by the Levenshtein library, which is only
+    imported when the engine is first used.
+    """
+
+    name = "levenshtein"
+
+    def ratio(self, genome1, genome2, progress=None, cancel=None) -> float:
+        import Levenshtein as lv
+
+        report(progress, cancel, 0, 1)
+        ratio = lv.ratio(genome1.tobytes(), genome2.tobytes())
+        report(progress, None, 1, 1)
+        return ratio
+
+    def distance(self, genome1, genome2, progress=None, cancel=None) -> int:
+        import Levenshtein as lv
+
+        report(progress, cancel, 0, 1)
+        distance = lv.distance(genome1.tobytes(), genome2.tobytes())
+        report(progress, None, 1, 1)
+        return distance
+
+    def bounded_distance(self, genome1, genome2, max_distance: int,
+                         progress=None, cancel=None):
+        import Levenshtein as lv
+
+        # The library gives up once the distance is above score_cutoff.
+        if abs(len(genome1) - len(genome2)) > max_distance:
+            return None
+        report(progress, cancel, 0, 1)
+        distance = lv.distance(genome1.tobytes(), genome2.tobytes(),
+                               weights=(1, 1, 2), score_cutoff=max_distance)
+        report(progress, None, 1, 1)
+        return distance if distance <= max_distance else None
+
+
+class BitParallelEngine(MatchEngine):
+    """Engine that computes a whole column of the dynamic programming
+    matrix per step, packed in the bits of a Python integer.
+
+    The shorter genome is the pattern: for each of the four bases (and
+    N) a mask marks where it occurs in the pattern. The longer genome is
+    then walked base by base, so a comparison takes len(text) steps
+    of a few integer operations over len(pattern) bits each.
+    """
+
+    name = "bitparallel"
+
+    @staticmethod
+    def pattern_masks(genome) -> list:
+        """Returns the match masks of a genome indexed by ASCII code.
+
+        Bit i of the mask of a base is set when the base appears at
+        position i of the genome. Codes other than A, C, G, T and N
+        get an empty mask.
+        """
+
+        bases = genome.tobytes()
+        masks = [0] * 256
+        for base in BASES + UNKNOWN:
+            bits = bases.translate(_INDICATORS[base])
+            masks[base] = int(bits[::-1] or b"0", 2)
+        return masks
+
+    @staticmethod
+    def _order(genome1, genome2):
+        if len(genome1) <= len(genome2):
+            return genome1, genome2
+        return genome2, genome1
+
+    def lcs(self, genome1, genome2, progress=None, cancel=None,
+            minimum: int = 0):
+        """Returns the length of the longest common subsequence of two
+        genomes, using the Allison-Dix/Hyyrö bit-vector recurrence.
+
+        Args:
+
+            minimum:
+                Optional length the LCS must reach. Between chunks of
+                the text the zero bits of the column give the LCS of
+                each prefix of the pattern with the text read so far;
+                the LCS of the genomes is at most the one of the first
+                len(pattern) - remaining bases plus the remaining
+                bases, so the recurrence stops once that cannot reach
+                minimum.
+
+        Returns:
+            The length of the LCS, or None when it is below minimum.
+        """
+
+        pattern, text = self._order(genome1, genome2)
+        if not len(pattern):
+            return 0 if minimum <= 0 else None
+        masks = self.pattern_masks(pattern)
+        full = (1 << len(pattern)) - 1
+
+        v = full
+        done = 0
+        for chunk in text.iter_chunks(PROGRESS_ROWS):
+            report(progress, cancel, done, len(text))
+            remaining = len(text) - done
+            if minimum > remaining:
+                reachable = len(pattern) - remaining
+                prefix = (1 << reachable) - 1
+                if reachable - (v & prefix).bit_count() + remaining \
+                        < minimum:
+                    return None
+            for code in chunk:
+                u = v & masks[code]
+                v = ((v + u) | (v - u)) & full
+            done += len(chunk)
+        report(progress, None, done, len(text))
+        lcs = len(pattern) - v.bit_count()
+        return lcs if lcs >= minimum else None
+
+    def ratio(self, genome1, genome2, progress=None, cancel=None) -> float:
+        total = len(genome1) + len(genome2)
+        if not total:
+            return 1.0
+        lcs = self.lcs(genome1, genome2, progress, cancel)
+        return 1.0 - (total - 2 * lcs) / total
+
+    def bounded_distance(self, genome1, genome2, max_distance: int,
+                         progress=None, cancel=None):
+        """Returns the indel distance between two genomes if it is at
+        most max_distance.
+
+        The distance is at most max_distance when the LCS is at least
+        (len(genome1) + len(genome2) - max_distance) / 2, so the LCS
+        is computed with that minimum and stops as soon as the rest of
+        the text cannot reach it.
+        """
+
+        total = len(genome1) + len(genome2)
+        if abs(len(genome1) - len(genome2)) > max_distance:
+            return None
+        lcs = self.lcs(genome1, genome2, progress, cancel,
+                       -(-(total - max_distance) // 2))
+        if lcs is None:
+            return None
+        return total - 2 * lcs
+
+    def distance(self, genome1, genome2, progress=None, cancel=None) -> int:
+        """Returns the Levenshtein distance between two genomes, using
+        Myers' bit-vector algorithm as described by Hyyrö.
+        """
+
+        pattern, text = self._order(genome1, genome2)
+        if not len(pattern):
+            return len(text)
+        masks = self.pattern_masks(pattern)
+        full = (1 << len(pattern)) - 1
+        last = 1 << (len(pattern) - 1)
+
+        positive, negative = full, 0
+        score = len(pattern)
+        done = 0
+        for chunk in text.iter_chunks(PROGRESS_ROWS):
+            report(progress, cancel, done, len(text))
+            done += len(chunk)
+            for code in chunk:
+                eq = masks[code]
+                xv = eq | negative
+                xh = (((eq & positive) + positive) ^ positive) | eq
+                ph = negative | ~(xh | positive)
+                mh = positive & xh
+                if ph & last:
+                    score += 1
+                elif mh & last:
+                    score -= 1
+                ph = (ph << 1) | 1
+                mh = mh << 1
+                positive = (mh | ~(xv | ph)) & full
+                negative = ph & xv & full
+        report(progress, None, done, len(text))
+        return score
+
+
+ENGINES = {
+    engine.name: engine
+    for engine in (LevenshteinEngine(), BitParallelEngine())
+}
+
+DEFAULT_ENGINE = "levenshtein"
+
+
+def get_engine(name: str = None) -> MatchEngine:
+    """Returns a registered engine by its name.
+
+    Args:
+
+        name:
+            The name of the engine. When None, DEFAULT_ENGINE is used.
+    """
+
+    try:
+        return ENGINES[DEFAULT_ENGINE if name is None else name]
+    except KeyError:
+        raise ValueError(f"Unknown matching engine: {name}") from None
+
+
+def register_engine(engine: MatchEngine):
+    """Makes an engine available to DNA.match under its name."""
+
+    ENGINES[engine.name] = engine
@@ -1,5 +1,6 @@
 """Multiplatform module for file dialogs."""
 
+import subprocess
 import sys
 
 
@@ -17,3 +18,24 @@ def fd(win_title: str = None) -> str:
 
         result = filedialog.askopenfilename()
         return result
+
+
+def choose_file(win_title: str = None) -> str:
+    """Shows the file dialog of fd in a process of its own.
+
+    The dialog toolkits want the main thread of their process, so
+    running them apart lets any thread wait for the answer while the
+    game keeps drawing.
+
+    Returns:
+        The chosen path, or None if the dialog was closed.
+    """
+
+    result = subprocess.run([sys.executable, __file__, win_title or ""],
+                            stdout=subprocess.PIPE, text=True)
+    path = result.stdout.strip()
+    return path if result.returncode == 0 and path else None
+
+
+if __name__ == "__main__":
+    print(fd(sys.argv[1] if len(sys.argv) > 1 else None) or "")
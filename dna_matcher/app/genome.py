@@ -0,0 +1,372 @@
+"""Module with the compact representation of genomes."""
+
+import bisect
+import re
+
+BASES = b"ACGT"
+# Unknown bases. They are kept as runs next to the packed bases.
+UNKNOWN = b"N"
+
+# Bases are coded as A=0, C=1, G=2 and T=3. Unknown bases are packed
+# as A and restored from their runs.
+_ENCODE = bytes.maketrans(BASES + UNKNOWN, bytes(range(4)) + b"\0")
+_DECODE = bytes.maketrans(bytes(range(4)), BASES)
+_UNKNOWN_RUNS = re.compile(re.escape(UNKNOWN) + b"+")
+
+
+# Amount of base codes packed or unpacked at once, a multiple of 4.
+# The work of a chunk is done on big integers of its size, so only the
+# masks of that size are ever built.
+CHUNK_CODES = 1 << 16
+
+
+def _mask(pattern: bytes, repeat: int) -> int:
+    return int.from_bytes(pattern * repeat, "little")
+
+
+# Masks of a whole chunk; shorter chunks are simply masked with them.
+_NIBBLES = _mask(b"\x0f\x00", CHUNK_CODES // 2)
+_BYTES = _mask(b"\xff\x00\x00\x00", CHUNK_CODES // 4)
+_CODES = _mask(b"\x03", CHUNK_CODES)
+
+
+def _pack_chunk(codes: bytes) -> bytes:
+    size = len(codes)
+    x = int.from_bytes(codes, "little")
+    x = (x | x >> 6) & _NIBBLES
+    x = (x | x >> 12) & _BYTES
+    return x.to_bytes(size, "little")[::4]
+
+
+def _unpack_chunk(packed) -> bytes:
+    size = len(packed) * 4
+    spread = bytearray(size)
+    spread[::4] = packed
+    x = int.from_bytes(spread, "little")
+    x = (x | x << 12) & _NIBBLES
+    x = (x | x << 6) & _CODES
+    return x.to_bytes(size, "little")
+
+
+def pack(codes: bytes) -> bytes:
+    """Packs base codes (0 to 3) four per byte.
+
+    The codes are folded together with big integer shifts, so the
+    work is done in C instead of a Python loop. It is done CHUNK_CODES
+    codes at a time, so the integers stay small whatever the length.
+
+    Args:
+
+        codes:
+            A bytes-like object where each byte is a base code.
+
+    Returns:
+        A bytes object with the codes packed. The first base of each
+        byte is stored in the lowest two bits.
+    """
+
+    codes = memoryview(codes)
+    packed = bytearray()
+    for start in range(0, len(codes), CHUNK_CODES):
+        chunk = bytes(codes[start:start + CHUNK_CODES])
+        packed += _pack_chunk(chunk + bytes(-len(chunk) % 4))
+    return bytes(packed)
+
+
+def unpack(packed) -> bytes:
+    """Unpacks bytes created by pack back into base codes.
+
+    Args:
+
+        packed:
+            A bytes-like object with four base codes per byte.
+
+    Returns:
+        A bytes object with one base code per byte.
+    """
+
+    packed = memoryview(packed)
+    codes = bytearray()
+    for start in range(0, len(packed), CHUNK_CODES // 4):
+        codes += _unpack_chunk(packed[start:start + CHUNK_CODES // 4])
+    return bytes(codes)
+
+
+class Genome:
+    """Base for genome classes.
+
+    Subclasses only need to implement __len__ and tobytes, which
+    returns a range of bases as ASCII.
+    """
+
+    def __len__(self):
+        return 0
+
+    def tobytes(self, start: int = 0, stop: int = None) -> bytes:
+        """Returns the bases between start and stop as ASCII."""
+
+        return b""
+
+    def iter_chunks(self, size: int = 1 << 16):
+        """Yields the bases as ASCII bytes objects of up to size bases."""
+
+        for start in range(0, len(self), size):
+            yield self.tobytes(start, start + size)
+
+    def base_counts(self) -> dict:
+        """Returns how many times each base appears in the genome."""
+
+        counts = dict.fromkeys("ACGT", 0)
+        for chunk in self.iter_chunks():
+            for base in counts:
+                counts[base] += chunk.count(base.encode("ascii"))
+        return counts
+
+    def __iter__(self):
+        for chunk in self.iter_chunks():
+            yield from chunk.decode("ascii")
+
+    def __eq__(self, other):
+        if not isinstance(other, Genome):
+            return NotImplemented
+        return len(self) == len(other) \
+            and all(a == b for a, b in zip(self.iter_chunks(),
+                                           other.iter_chunks()))
+
+    def __str__(self):
+        return self.tobytes().decode("ascii")
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {len(self)} bases>"
+
+
+class PackedGenome(Genome):
+    """A genome that stores four bases per byte.
+
+    Slices share the buffer of the genome they come from, so taking a
+    window out of a large genome never copies it.
+
+    Unknown bases (N) cannot be packed in two bits, so they are packed
+    as A and their runs are kept in a sorted list of (start, stop)
+    indices of data. Genomes without them pay nothing for it.
+    """
+
+    def __init__(self, data=None, length: int = 0, start: int = 0,
+                 gaps=None):
+        """Initialises the PackedGenome object.
+
+        Args:
+
+            data:
+                A buffer with packed bases, as created by pack. When
+                None, an empty bytearray is used.
+
+            length:
+                The amount of bases in the genome.
+
+            start:
+                Index of the first base of the genome inside data.
+
+            gaps:
+                The runs of unknown bases, as (start, stop) indices of
+                data. When None, an empty list is used.
+        """
+
+        self.data = bytearray() if data is None else data
+        self.length = length
+        self.start = start
+        self.gaps = [] if gaps is None else gaps
+        # Whether data and gaps belong to another genome this one was
+        # sliced from. Such a genome is copied before it is extended.
+        self.shared = False
+
+    @classmethod
+    def from_bases(cls, bases: bytes):
+        """Creates a packed genome from ASCII bases."""
+
+        genome = cls()
+        genome.extend(bases)
+        return genome
+
+    @classmethod
+    def from_genome(cls, genome, chunk_size: int = 1 << 20):
+        """Creates a packed genome from any genome, chunk by chunk, so
+        its bases are never held as ASCII all at once.
+        """
+
+        packed = cls()
+        for chunk in genome.iter_chunks(chunk_size):
+            packed.extend(chunk)
+        return packed
+
+    def extend(self, bases: bytes):
+        """Appends ASCII bases to the end of the genome.
+
+        Args:
+
+            bases:
+                A bytes-like object containing only A, C, G, T and N.
+        """
+
+        if self.shared or not isinstance(self.data, bytearray):
+            # Slices and read-only buffers get bases of their own
+            # first, so the genome they come from is left alone.
+            copy = PackedGenome.from_genome(self)
+            self.data, self.start, self.gaps = copy.data, 0, copy.gaps
+            self.shared = False
+        end = self.start + self.length
+        if UNKNOWN in bases:
+            for run in _UNKNOWN_RUNS.finditer(bases):
+                first, last = end + run.start(), end + run.end()
+                if self.gaps and self.gaps[-1][1] == first:
+                    first = self.gaps.pop()[0]
+                self.gaps.append((first, last))
+        head = -end % 4
+        for i, code in enumerate(bytes(bases[:head]).translate(_ENCODE)):
+            self.data[-1] |= code << ((end + i) % 4 * 2)
+        self.data += pack(bytes(bases[head:]).translate(_ENCODE))
+        self.length += len(bases)
+
+    @property
+    def nbytes(self) -> int:
+        """Amount of bytes used by the bases of this genome."""
+
+        return (self.length + 3) // 4
+
+    def view(self) -> memoryview:
+        """Returns a zero-copy memoryview of the packed bytes.
+
+        The view starts at the byte holding the first base; the
+        base offset inside that byte is start % 4.
+        """
+
+        first = self.start // 4
+        last = (self.start + self.length + 3) // 4
+        return memoryview(self.data)[first:last]
+
+    def tobytes(self, start: int = 0, stop: int = None) -> bytes:
+        """Returns the bases between start and stop as ASCII."""
+
+        stop = self.length if stop is None else min(stop, self.length)
+        if start >= stop:
+            return b""
+        first = self.start + start
+        last = self.start + stop
+        # Unpacked a chunk at a time, so only the result is held whole.
+        bases = bytearray()
+        with memoryview(self.data) as data:
+            for offset in range(first // 4, (last + 3) // 4,
+                                CHUNK_CODES // 4):
+                chunk = data[offset:min(offset + CHUNK_CODES // 4,
+                                        (last + 3) // 4)]
+                bases += _unpack_chunk(chunk).translate(_DECODE)
+        del bases[:first % 4]
+        del bases[last - first:]
+        for gap_start, gap_stop in self.gaps_between(start, stop):
+            bases[gap_start - start:gap_stop - start] = \
+                UNKNOWN * (gap_stop - gap_start)
+        return bytes(bases)
+
+    def gaps_between(self, start: int = 0, stop: int = None) -> list:
+        """Returns the runs of unknown bases between start and stop, as
+        (start, stop) positions of the genome.
+        """
+
+        stop = self.length if stop is None else min(stop, self.length)
+        if not self.gaps or start >= stop:
+            return []
+        first, last = self.start + start, self.start + stop
+        gaps = []
+        index = bisect.bisect_right(self.gaps, first, key=lambda gap: gap[1])
+        while index < len(self.gaps) and self.gaps[index][0] < last:
+            gap_start, gap_stop = self.gaps[index]
+            gaps.append((max(gap_start, first) - self.start,
+                         min(gap_stop, last) - self.start))
+            index += 1
+        return gaps
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self.length)
+            if step != 1:
+                return PackedGenome.from_bases(self.tobytes()[key])
+            genome = PackedGenome(self.data, max(stop - start, 0),
+                                  self.start + start, self.gaps)
+            genome.shared = True
+            return genome
+
+        if key < 0:
+            key += self.length
+        if not 0 <= key < self.length:
+            raise IndexError("genome index out of range")
+        if self.gaps_between(key, key + 1):
+            return UNKNOWN.decode("ascii")
+        index = self.start + key
+        return "ACGT"[self.data[index // 4] >> (index % 4 * 2) & 3]
+
+
+class MappedGenome(Genome):
+    """A genome read straight from a memory-mapped ASCII sample.
+
+    The bases are never copied into the Python heap: they are read
+    from the page cache, which is shared by every process mapping the
+    same file. Slices share the map as well.
+    """
+
+    def __init__(self, buffer, length: int, start: int = 0):
+        """Initialises the MappedGenome object.
+
+        Args:
+
+            buffer:
+                A mmap (or any other buffer) holding ASCII bases.
+
+            length:
+                The amount of bases in the genome.
+
+            start:
+                Index of the first base of the genome inside buffer.
+        """
+
+        self.buffer = buffer
+        self.length = length
+        self.start = start
+
+    @property
+    def nbytes(self) -> int:
+        """Amount of bytes used by the bases of this genome."""
+
+        return self.length
+
+    def view(self) -> memoryview:
+        """Returns a zero-copy memoryview of the ASCII bases."""
+
+        return memoryview(self.buffer)[self.start:self.start + self.length]
+
+    def tobytes(self, start: int = 0, stop: int = None) -> bytes:
+        """Returns the bases between start and stop as ASCII."""
+
+        stop = self.length if stop is None else min(stop, self.length)
+        if start >= stop:
+            return b""
+        return self.buffer[self.start + start:self.start + stop]
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self.length)
+            if step != 1:
+                return PackedGenome.from_bases(self.tobytes()[key])
+            return MappedGenome(self.buffer, max(stop - start, 0),
+                                self.start + start)
+
+        if key < 0:
+            key += self.length
+        if not 0 <= key < self.length:
+            raise IndexError("genome index out of range")
+        return chr(self.buffer[self.start + key])
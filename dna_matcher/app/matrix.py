@@ -0,0 +1,402 @@
+"""Module for all-vs-all distance matrices and the clustering of
+samples.
+
+Distances are 1 - Sample.match, kept in a condensed matrix: the upper
+triangle of the matrix, row by row, like scipy.spatial.distance.pdist.
+The matrix is stored as a .npy file (float64), so numpy.load can read
+it, but numpy is not needed to write it.
+"""
+
+import array
+import ast
+import concurrent.futures
+import json
+import math
+import mmap
+import os
+import struct
+
+from . import batch
+from .cache import content_key
+from .sample import Sample
+
+TILE_SIZE = 32
+# Distance given to the pairs that are not matched exactly because
+# their sketches rule out any closeness: about the distance of
+# unrelated random genomes, whose ratio is around 0.65.
+UNRELATED_DISTANCE = 0.35
+
+_NPY_MAGIC = b"\x93NUMPY\x01\x00"
+
+
+def condensed_size(n: int) -> int:
+    """Returns the amount of pairs of n samples."""
+
+    return n * (n - 1) // 2
+
+
+def condensed_index(i: int, j: int, n: int) -> int:
+    """Returns the position of the pair (i, j) in a condensed matrix."""
+
+    if i > j:
+        i, j = j, i
+    return n * i - i * (i + 1) // 2 + j - i - 1
+
+
+def _npy_header(count: int) -> bytes:
+    header = "{'descr': '<f8', 'fortran_order': False, 'shape': (%d,), }" \
+        % count
+    # The header is padded so the data starts at a multiple of 64.
+    header += " " * (-(len(_NPY_MAGIC) + 2 + len(header) + 1) % 64) + "\n"
+    return _NPY_MAGIC + struct.pack("<H", len(header)) \
+        + header.encode("latin1")
+
+
+def _read_npy_header(matrix_file):
+    """Returns the amount of values and the data offset of a .npy
+    file written by DistanceMatrix.
+    """
+
+    magic = matrix_file.read(len(_NPY_MAGIC))
+    if magic != _NPY_MAGIC:
+        raise ValueError("Not a version 1.0 .npy file.")
+    header_length, = struct.unpack("<H", matrix_file.read(2))
+    header = matrix_file.read(header_length).decode("latin1")
+    header = ast.literal_eval(header)
+    if header["descr"] != "<f8" or len(header["shape"]) != 1:
+        raise ValueError("Not a condensed distance matrix.")
+    return header["shape"][0], len(_NPY_MAGIC) + 2 + header_length
+
+
+def samples_path(path: str) -> str:
+    """Returns the path of the file naming the samples of a matrix."""
+
+    return path + ".samples.json"
+
+
+def sample_keys(samples) -> list:
+    """Returns the [path, content key] of each sample (any object with a
+    file attribute, like Sample), which tell the samples of a matrix.
+    """
+
+    return [[os.path.abspath(sample.file), content_key(sample.file)]
+            for sample in samples]
+
+
+class DistanceMatrix:
+    """A condensed distance matrix stored in a .npy file.
+
+    Missing distances are NaN, so a computation that was interrupted
+    can be resumed from the distances already written. The samples of
+    the matrix are written next to it (see samples_path), so it is
+    never resumed for other samples.
+    """
+
+    def __init__(self, path: str, n: int, keys: list = None):
+        """Opens the matrix of n samples at path, creating it if
+        needed.
+
+        Args:
+
+            path:
+                The .npy file of the matrix.
+
+            n:
+                The amount of samples.
+
+            keys:
+                The sample_keys of the samples, in order. When given,
+                they are written with a new matrix and checked against
+                those of an existing one.
+
+        Raises:
+            ValueError: if the file holds a matrix of another size, or
+                of other samples.
+        """
+
+        self.path = path
+        self.n = n
+        count = condensed_size(n)
+        if keys is not None:
+            if not os.path.exists(path):
+                with open(samples_path(path), "w") as samples_file:
+                    json.dump(keys, samples_file, indent=1)
+            else:
+                try:
+                    with open(samples_path(path)) as samples_file:
+                        stored_keys = json.load(samples_file)
+                except (OSError, ValueError):
+                    stored_keys = None
+                if stored_keys != keys:
+                    raise ValueError(
+                        f"{path} was computed for other samples; delete it "
+                        "or choose another path.")
+        if not os.path.exists(path):
+            with open(path, "wb") as matrix_file:
+                matrix_file.write(_npy_header(count))
+                matrix_file.write(
+                    array.array("d", [math.nan]).tobytes() * count)
+
+        self.file = open(path, "r+b")
+        stored, self.offset = _read_npy_header(self.file)
+        if stored != count:
+            self.file.close()
+            raise ValueError(f"{path} holds {stored} distances, "
+                             f"expected {count}.")
+        self.buffer = mmap.mmap(self.file.fileno(), 0) if count else None
+
+    def __getitem__(self, pair):
+        i, j = pair
+        if i == j:
+            return 0.0
+        position = self.offset + 8 * condensed_index(i, j, self.n)
+        return struct.unpack_from("<d", self.buffer, position)[0]
+
+    def __setitem__(self, pair, distance):
+        position = self.offset + 8 * condensed_index(*pair, self.n)
+        struct.pack_into("<d", self.buffer, position, distance)
+
+    def values(self) -> array.array:
+        """Returns a copy of the condensed distances."""
+
+        values = array.array("d")
+        if self.buffer is not None:
+            values.frombytes(self.buffer[self.offset:])
+        return values
+
+    def flush(self):
+        if self.buffer is not None:
+            self.buffer.flush()
+
+    def close(self):
+        if self.buffer is not None:
+            self.buffer.close()
+        self.file.close()
+
+
+def tiles(n: int, tile_size: int = TILE_SIZE):
+    """Yields the tiles of the upper triangle of a n by n matrix, as
+    lists of (i, j) pairs.
+    """
+
+    for row in range(0, n, tile_size):
+        for column in range(row, n, tile_size):
+            yield [
+                (i, j)
+                for i in range(row, min(row + tile_size, n))
+                for j in range(max(column, i + 1),
+                               min(column + tile_size, n))
+            ]
+
+
+def unrelated(sketch1, sketch2) -> bool:
+    """Returns whether two sketches rule out any closeness of their
+    genomes: both are full, so they hold enough k-mers for the estimate
+    to mean something, and they share none of them.
+    """
+
+    return len(sketch1) == sketch1.size and len(sketch2) == sketch2.size \
+        and sketch1.jaccard(sketch2) == 0
+
+
+def _distance_tile(pairs, sources, engine_name):
+    batch._load(sources)
+    results = []
+    for i, j in pairs:
+        sample1, sample2 = batch._genomes[i], batch._genomes[j]
+        if sample1.sketch is not None \
+                and unrelated(sample1.sketch, sample2.sketch):
+            # Genomes of different lengths are at least that far.
+            total = len(sample1.genome) + len(sample2.genome)
+            distance = abs(len(sample1.genome) - len(sample2.genome)) \
+                / total
+            results.append((i, j, max(distance, UNRELATED_DISTANCE)))
+            continue
+        results.append((i, j, 1.0 - Sample.match(sample1, sample2,
+                                                   engine_name)))
+    return results
+
+
+def compute_matrix(samples, path: str, workers: int = None,
+                   tile_size: int = TILE_SIZE, engine_name: str = None,
+                   skip_unrelated: bool = True):
+    """Computes the all-vs-all distance matrix of some samples.
+
+    The matrix is split in tiles that are computed in a pool of
+    processes and written as soon as they are done. If path already
+    holds a matrix for these samples (the same files, in the same
+    order), the tiles it completed are skipped.
+
+    Args:
+
+        samples:
+            A list of Sample objects.
+
+        path:
+            Where the .npy matrix is written.
+
+        workers:
+            The amount of processes. When None, one per CPU core.
+
+        tile_size:
+            The width of the tiles, in samples.
+
+        engine_name:
+            The matching engine given to Sample.match.
+
+        skip_unrelated:
+            Whether the pairs whose sketches rule out any closeness
+            (see unrelated) are given UNRELATED_DISTANCE instead of
+            being matched. It takes sketching every sample.
+
+    Yields:
+        The amount of pairs done so far, after every tile.
+
+    Raises:
+        ValueError: if path holds a matrix of other samples.
+    """
+
+    matrix = DistanceMatrix(path, len(samples), sample_keys(samples))
+    pending = [
+        tile for tile in tiles(len(samples), tile_size)
+        if any(math.isnan(matrix[pair]) for pair in tile)
+    ]
+    done = condensed_size(len(samples)) - sum(map(len, pending))
+    # Each tile is sent with the paths and sketches of its samples.
+    paths = [sample.file for sample in samples]
+    sketches = [sample.sketch for sample in samples] if skip_unrelated \
+        else None
+
+    try:
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            futures = [
+                executor.submit(_distance_tile, tile,
+                                batch._chunk_sources(tile, paths, sketches),
+                                engine_name)
+                for tile in pending
+            ]
+            for future in concurrent.futures.as_completed(futures):
+                results = future.result()
+                for i, j, distance in results:
+                    matrix[i, j] = distance
+                matrix.flush()
+                done += len(results)
+                yield done
+    finally:
+        matrix.close()
+
+
+def linkage(distances, n: int, method: str = "average") -> list:
+    """Clusters n samples from their condensed distance matrix.
+
+    It uses the nearest-neighbour chain algorithm, which takes
+    O(n^2) time, with single linkage or UPGMA ("average").
+
+    Args:
+
+        distances:
+            The condensed distances (for example DistanceMatrix.values).
+
+        n:
+            The amount of samples.
+
+        method:
+            Either "single" or "average".
+
+    Returns:
+        A linkage list in the format of scipy.cluster.hierarchy: the
+        row k merges the clusters a and b, at the given distance, into
+        the cluster n + k of size samples, [a, b, distance, size].
+    """
+
+    if method not in ("single", "average"):
+        raise ValueError(f"Unknown linkage method: {method}")
+
+    distances = array.array("d", distances)
+    sizes = [1] * n
+    active = set(range(n))
+    chain = []
+    merges = []
+    while len(active) > 1:
+        if not chain:
+            chain.append(min(active))
+        while True:
+            a = chain[-1]
+            nearest = chain[-2] if len(chain) > 1 else None
+            nearest_distance = math.inf if nearest is None \
+                else distances[condensed_index(a, nearest, n)]
+            for b in active:
+                if b != a \
+                        and distances[condensed_index(a, b, n)] \
+                        < nearest_distance:
+                    nearest = b
+                    nearest_distance = distances[condensed_index(a, b, n)]
+            if len(chain) > 1 and nearest == chain[-2]:
+                break
+            chain.append(nearest)
+
+        a, b = chain.pop(), chain.pop()
+        a, b = min(a, b), max(a, b)
+        active.remove(b)
+        for c in active:
+            if c == a:
+                continue
+            distance_a = distances[condensed_index(a, c, n)]
+            distance_b = distances[condensed_index(b, c, n)]
+            if method == "single":
+                merged = min(distance_a, distance_b)
+            else:
+                merged = (sizes[a] * distance_a + sizes[b] * distance_b) \
+                    / (sizes[a] + sizes[b])
+            distances[condensed_index(a, c, n)] = merged
+        merges.append((nearest_distance, a, b))
+        sizes[a] += sizes[b]
+
+    # The chain finds the merges out of order; they are sorted and
+    # labelled like scipy does.
+    merges.sort(key=lambda merge: merge[0])
+    parents = list(range(n))
+    labels = list(range(n))
+    sizes = [1] * n
+
+    def find(x):
+        while parents[x] != x:
+            parents[x] = parents[parents[x]]
+            x = parents[x]
+        return x
+
+    result = []
+    for k, (distance, a, b) in enumerate(merges):
+        a, b = find(a), find(b)
+        label_a, label_b = sorted((labels[a], labels[b]))
+        result.append([label_a, label_b, distance, sizes[a] + sizes[b]])
+        parents[b] = a
+        sizes[a] += sizes[b]
+        labels[a] = n + k
+    return result
+
+
+def flat_clusters(linkage_list: list, n: int, threshold: float) -> list:
+    """Cuts a linkage at a distance.
+
+    Returns:
+        A list with the cluster number (from 0) of each sample.
+        Samples joined at a distance of at most threshold share their
+        cluster.
+    """
+
+    parents = list(range(2 * n - 1))
+
+    def find(x):
+        while parents[x] != x:
+            parents[x] = parents[parents[x]]
+            x = parents[x]
+        return x
+
+    for k, (a, b, distance, _) in enumerate(linkage_list):
+        if distance <= threshold:
+            parents[find(int(a))] = n + k
+            parents[find(int(b))] = n + k
+
+    numbers = dict()
+    return [numbers.setdefault(find(i), len(numbers)) for i in range(n)]
@@ -0,0 +1,330 @@
+"""Module for the binary .moura format.
+
+A binary .moura file is laid out as:
+
+    header       HEADER_SIZE bytes, ending with the CRC-32 of the rest
+                 of the header.
+    bases        The bases packed four per byte (see genome.pack), in
+                 blocks of block_bases bases.
+    exceptions   A (start, stop) pair per run of unknown bases (N),
+                 which are packed as A.
+    block index  The offset and CRC-32 of each block.
+
+Every integer is little-endian. Text .moura files hold bases as ASCII
+and never start with MAGIC.
+"""
+
+import mmap
+import os
+import struct
+import zlib
+
+from .genome import PackedGenome
+
+MAGIC = b"\x89MOURA\r\n"
+# Bumped every time the layout changes. Files of a newer version are
+# refused.
+VERSION = 1
+# Amount of bases of a block, a multiple of 4.
+BLOCK_BASES = 1 << 20
+HEADER_SIZE = 64
+
+# magic, version, flags, block_bases, length, block_count, gap_count,
+# data_offset, gaps_offset, index_offset.
+_HEADER = struct.Struct("<8sHHIQIIQQQ")
+_HEADER_CRC = struct.Struct("<I")
+_GAP = struct.Struct("<QQ")
+_BLOCK = struct.Struct("<QI")
+
+
+def is_binary(head: bytes) -> bool:
+    """Returns whether a file starting with head is a binary .moura."""
+
+    return head.startswith(MAGIC)
+
+
+class MouraFile:
+    """An open binary .moura file.
+
+    The file is mapped once; the header, exceptions and block index are
+    read from the map and the bases are left in it, so a window of any
+    size is read without touching the rest of the file.
+    """
+
+    def __init__(self, path: str):
+        """Initialises the MouraFile object.
+
+        Args:
+
+            path:
+                Path to the binary .moura file.
+
+        Raises:
+            ValueError: if the file is not a valid binary .moura, or it
+                was written by a newer version.
+        """
+
+        self.path = path
+        with open(path, "rb") as moura_file:
+            if os.fstat(moura_file.fileno()).st_size < HEADER_SIZE:
+                raise ValueError(f"{path} is not a binary .moura file.")
+            self.buffer = mmap.mmap(moura_file.fileno(), 0,
+                                    access=mmap.ACCESS_READ)
+        try:
+            self.read_header()
+        except (ValueError, struct.error) as error:
+            self.buffer.close()
+            raise ValueError(f"{path} is not a valid .moura file "
+                             f"({error}).") from None
+
+    def read_header(self):
+        """Reads the header, exceptions and block index."""
+
+        header = self.buffer[:HEADER_SIZE]
+        (magic, self.version, self.flags, self.block_bases, self.length,
+         block_count, gap_count, self.data_offset, gaps_offset,
+         index_offset) = _HEADER.unpack_from(header)
+        crc, = _HEADER_CRC.unpack_from(header, HEADER_SIZE
+                                       - _HEADER_CRC.size)
+        if magic != MAGIC or zlib.crc32(header[:_HEADER.size]) != crc:
+            raise ValueError("bad header")
+        if self.version > VERSION:
+            raise ValueError(f"format {self.version} is newer than "
+                             f"{VERSION}")
+        if not self.block_bases or self.block_bases % 4 \
+                or block_count != -(-self.length // self.block_bases) \
+                or self.data_offset + self.nbytes > gaps_offset \
+                or gaps_offset + gap_count * _GAP.size > index_offset \
+                or index_offset + block_count * _BLOCK.size \
+                > len(self.buffer):
+            raise ValueError("bad layout")
+
+        self.gaps = list(_GAP.iter_unpack(
+            self.buffer[gaps_offset:gaps_offset + gap_count * _GAP.size]))
+        last = 0
+        for start, stop in self.gaps:
+            if not last <= start < stop <= self.length:
+                raise ValueError("bad exceptions")
+            last = stop
+        self.blocks = list(_BLOCK.iter_unpack(
+            self.buffer[index_offset:index_offset
+                        + block_count * _BLOCK.size]))
+        # Blocks of version 1 follow each other.
+        for index, (offset, _) in enumerate(self.blocks):
+            if offset != self.data_offset + index * self.block_bases // 4:
+                raise ValueError("bad block index")
+
+    @property
+    def nbytes(self) -> int:
+        """Amount of bytes used by the packed bases."""
+
+        return (self.length + 3) // 4
+
+    def block_size(self, index: int) -> int:
+        """Returns the amount of bytes of a block."""
+
+        bases = min(self.block_bases,
+                    self.length - index * self.block_bases)
+        return (bases + 3) // 4
+
+    def block(self, index: int) -> memoryview:
+        """Returns the packed bases of a block, without copying them."""
+
+        offset = self.blocks[index][0]
+        return memoryview(self.buffer)[offset:offset
+                                       + self.block_size(index)]
+
+    def verify(self, progress=None, cancel=None):
+        """Checks the CRC-32 of every block.
+
+        Args:
+
+            progress:
+                An optional function called with the amount of bytes
+                checked so far and the amount of bytes of the bases.
+
+            cancel:
+                An optional CancelToken, checked before each block.
+
+        Raises:
+            ValueError: if a block does not match its checksum.
+        """
+
+        done = 0
+        for index, (_, crc) in enumerate(self.blocks):
+            if cancel is not None:
+                cancel.check()
+            with self.block(index) as block:
+                if zlib.crc32(block) != crc:
+                    raise ValueError(f"Block {index} of {self.path} is "
+                                     "corrupted.")
+                done += len(block)
+            if progress is not None:
+                progress(done, self.nbytes)
+
+    def genome(self) -> PackedGenome:
+        """Returns the genome of the file, reading its bases straight
+        from the map.
+
+        The blocks follow each other, so the genome is a single packed
+        buffer and any window of it is found with a division.
+        """
+
+        data = memoryview(self.buffer)[self.data_offset:
+                                       self.data_offset + self.nbytes]
+        return PackedGenome(data, self.length, gaps=self.gaps)
+
+    def close(self):
+        self.buffer.close()
+
+
+def read_genome(path: str, mapped: bool = True, progress=None,
+                cancel=None, verify: bool = None) -> PackedGenome:
+    """Loads the genome of a binary .moura file.
+
+    Args:
+
+        path:
+            Path to the binary .moura file.
+
+        mapped:
+            Whether the genome reads its bases from the map of the
+            file. Otherwise they are copied into memory, block by
+            block, and the file is closed.
+
+        progress, cancel:
+            Optional progress callback and CancelToken (see
+            MouraFile.verify).
+
+        verify:
+            Whether the blocks are checked against their checksums.
+            When None, only copied genomes are checked: checking a
+            mapped one would read the whole file, while mapping it
+            only reads the pages that are used.
+
+    Raises:
+        ValueError: if the file is not valid.
+    """
+
+    if verify is None:
+        verify = not mapped
+    moura_file = MouraFile(path)
+    try:
+        if verify:
+            moura_file.verify(progress, cancel)
+        if mapped:
+            return moura_file.genome()
+        data = bytearray()
+        for index in range(len(moura_file.blocks)):
+            with moura_file.block(index) as block:
+                data += block
+    except BaseException:
+        moura_file.close()
+        raise
+    moura_file.close()
+    return PackedGenome(data, moura_file.length, gaps=moura_file.gaps)
+
+
+class MouraWriter:
+    """Writes a binary .moura file from bases given in pieces of any
+    size, so a sample can be converted without holding it whole.
+
+    The file is written next to its path and moved there when the
+    writer is closed; it can be used as a context manager.
+    """
+
+    def __init__(self, path: str, block_bases: int = BLOCK_BASES):
+        """Initialises the MouraWriter object.
+
+        Args:
+
+            path:
+                Path of the binary .moura file.
+
+            block_bases:
+                The amount of bases of a block, a multiple of 4.
+        """
+
+        if block_bases <= 0 or block_bases % 4:
+            raise ValueError("The bases of a block must be a multiple of 4.")
+        self.path = path
+        self.block_bases = block_bases
+        self.temporary = path + f".{os.getpid()}.tmp"
+        self.file = open(self.temporary, "wb")
+        self.file.write(bytes(HEADER_SIZE))
+        self.length = 0
+        self.gaps = []
+        self.blocks = []
+        self.pending = bytearray()
+
+    def write(self, bases: bytes):
+        """Appends ASCII bases (A, C, G, T and N) to the file."""
+
+        self.pending += bases
+        while len(self.pending) >= self.block_bases:
+            self.write_block(self.pending[:self.block_bases])
+            del self.pending[:self.block_bases]
+
+    def write_block(self, bases: bytes):
+        genome = PackedGenome.from_bases(bases)
+        for start, stop in genome.gaps:
+            start, stop = self.length + start, self.length + stop
+            # Runs going over the end of a block are merged back.
+            if self.gaps and self.gaps[-1][1] == start:
+                start = self.gaps.pop()[0]
+            self.gaps.append((start, stop))
+        self.blocks.append((self.file.tell(), zlib.crc32(genome.data)))
+        self.file.write(genome.data)
+        self.length += len(genome)
+
+    def close(self):
+        """Writes the end of the file and moves it to its path."""
+
+        if self.pending:
+            self.write_block(self.pending)
+            self.pending = bytearray()
+        gaps_offset = self.file.tell()
+        for gap in self.gaps:
+            self.file.write(_GAP.pack(*gap))
+        index_offset = self.file.tell()
+        for block in self.blocks:
+            self.file.write(_BLOCK.pack(*block))
+
+        header = _HEADER.pack(MAGIC, VERSION, 0, self.block_bases,
+                              self.length, len(self.blocks), len(self.gaps),
+                              HEADER_SIZE, gaps_offset, index_offset)
+        header += bytes(HEADER_SIZE - len(header) - _HEADER_CRC.size)
+        self.file.seek(0)
+        self.file.write(header + _HEADER_CRC.pack(zlib.crc32(
+            header[:_HEADER.size])))
+        self.file.close()
+        os.replace(self.temporary, self.path)
+
+    def abort(self):
+        """Deletes the partly written file."""
+
+        self.file.close()
+        os.remove(self.temporary)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def write_genome(path: str, genome, block_bases: int = BLOCK_BASES,
+                 cancel=None):
+    """Writes a genome (any Genome) as a binary .moura file.
+
+    An optional CancelToken is checked before each block.
+    """
+
+    with MouraWriter(path, block_bases) as writer:
+        for chunk in genome.iter_chunks(block_bases):
+            if cancel is not None:
+                cancel.check()
+            writer.write(chunk)
@@ -0,0 +1,113 @@
+"""Module for timing the game loop and the slow operations of the app."""
+
+import collections
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+# Amount of durations kept per name for the percentiles.
+HISTORY_SIZE = 600
+# Amount of spans kept for the trace.
+MAX_EVENTS = 100_000
+# Time budget of a frame at 60 FPS, in milliseconds.
+FRAME_BUDGET = 1000 / 60
+
+
+class Profiler:
+    """Times named spans of code, like the phases of a frame.
+
+    The last durations of every name are kept for percentiles, and
+    every span is kept as a trace event that can be exported for
+    chrome://tracing or Perfetto. Nothing is recorded while the
+    profiler is disabled.
+    """
+
+    def __init__(self, history_size: int = HISTORY_SIZE,
+                 max_events: int = MAX_EVENTS):
+        self.enabled = False
+        self.history_size = history_size
+        # Durations in milliseconds, by name.
+        self.durations = dict()
+        self.events = collections.deque(maxlen=max_events)
+        self.origin = time.perf_counter()
+
+    @contextlib.contextmanager
+    def span(self, name: str):
+        """Times the code run inside a with statement."""
+
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter())
+
+    def timed(self, name: str):
+        """Decorator timing every call of a function."""
+
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                with self.span(name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def record(self, name: str, start: float, stop: float):
+        """Records a span, given its perf_counter start and stop."""
+
+        if name not in self.durations:
+            self.durations[name] = collections.deque(
+                maxlen=self.history_size)
+        self.durations[name].append((stop - start) * 1000)
+        self.events.append((name, start, stop, threading.get_ident()))
+
+    def percentiles(self, name: str, points=(50, 95, 99)) -> list:
+        """Returns percentiles of the last durations of a name, in
+        milliseconds, followed by the maximum.
+        """
+
+        durations = sorted(self.durations.get(name, ()))
+        if not durations:
+            return [0.0] * (len(points) + 1)
+        return [durations[min(len(durations) - 1,
+                              len(durations) * point // 100)]
+                for point in points] + [durations[-1]]
+
+    def over_budget(self, name: str = "frame",
+                    budget: float = FRAME_BUDGET) -> int:
+        """Returns how many of the last durations went over budget."""
+
+        return sum(duration > budget
+                   for duration in self.durations.get(name, ()))
+
+    def export(self, path: str):
+        """Writes the recorded spans as a Chrome trace JSON file."""
+
+        pid = os.getpid()
+        trace_events = [{
+            "name": name,
+            "ph": "X",
+            "ts": (start - self.origin) * 1e6,
+            "dur": (stop - start) * 1e6,
+            "pid": pid,
+            "tid": tid
+        } for name, start, stop, tid in list(self.events)]
+        with open(path, "w") as trace_file:
+            json.dump({"traceEvents": trace_events,
+                       "displayTimeUnit": "ms"}, trace_file)
+
+    def clear(self):
+        self.durations.clear()
+        self.events.clear()
+
+
+# The profiler shared by the game and the app.
+profiler = Profiler()
@@ -0,0 +1,50 @@
+"""Module for cancelling long operations, like loading and matching
+large samples, from another thread.
+"""
+
+import threading
+import time
+
+
+class Cancelled(Exception):
+    """Raised by an operation whose CancelToken was cancelled."""
+
+
+class CancelToken:
+    """A flag shared by an operation and whoever may cancel it.
+
+    Cancelling is cooperative: the operation calls check every now
+    and then, which raises Cancelled once cancel was called.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        """Asks the operation to stop."""
+
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def check(self):
+        """Raises Cancelled if the operation was cancelled."""
+
+        if self.cancelled:
+            raise Cancelled()
+
+
+class Deadline(CancelToken):
+    """A CancelToken that is also cancelled once some time passed,
+    to give an operation a time budget.
+    """
+
+    def __init__(self, seconds: float):
+        super().__init__()
+        self.end = time.monotonic() + seconds
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set() or time.monotonic() >= self.end
@@ -0,0 +1,606 @@
+"""Module for reading samples in the formats given by sequencers."""
+
+import bisect
+import itertools
+import mmap
+import os
+import re
+import zlib
+
+from . import bgzf
+from .genome import BASES, UNKNOWN, Genome, PackedGenome
+from .progress import Cancelled
+
+# Amount of bytes read from a sample file at once.
+CHUNK_SIZE = 1 << 16
+# Most bytes inflated from a compressed chunk at once.
+INFLATE_LIMIT = 1 << 20
+# Amount of bytes looked at to tell the format of a sample.
+HEAD_SIZE = 1 << 10
+
+WHITESPACE = b" \t\r\n"
+GZIP_MAGIC = b"\x1f\x8b"
+
+# Extensions of the files taken as samples when scanning directories.
+SAMPLE_EXTENSIONS = (".moura", ".fa", ".fasta", ".fna", ".fq", ".fastq")
+COMPRESSED_EXTENSIONS = (".gz", ".bgz")
+
+# Ambiguous IUPAC codes, which are read as unknown bases.
+_AMBIGUOUS = b"NRYKMSWBDHV"
+_LETTERS = BASES + _AMBIGUOUS
+_NORMALISE = bytes.maketrans(
+    _LETTERS + _LETTERS.lower(),
+    (BASES + UNKNOWN * len(_AMBIGUOUS)) * 2)
+_VALID = BASES + UNKNOWN
+_FASTA_HEADER = re.compile(rb"^>([^\n]*)(?:\n|$)", re.MULTILINE)
+
+
+def is_sample_file(name: str) -> bool:
+    """Returns whether a file name has the extension of a sample,
+    compressed or not.
+    """
+
+    name = name.lower()
+    for extension in COMPRESSED_EXTENSIONS:
+        if name.endswith(extension):
+            name = name[:-len(extension)]
+            break
+    return name.endswith(SAMPLE_EXTENSIONS)
+
+
+def normalise(sequence: bytes):
+    """Returns sequence in upper case, without whitespace and with its
+    ambiguous bases turned into N.
+
+    Returns:
+        The bases, or None if sequence holds anything else.
+    """
+
+    bases = sequence.translate(_NORMALISE, WHITESPACE)
+    if bases.translate(None, _VALID):
+        return None
+    return bases
+
+
+def _record_name(header: bytes) -> str:
+    return header.strip().decode("utf-8", "replace")
+
+
+class SequenceReader:
+    """Base for the readers of sample formats.
+
+    A reader tells whether it understands a sample from its first
+    bytes, and parses the (decompressed) data of the sample given as
+    chunks of any size, so it never needs the whole sample at once.
+    """
+
+    name = None
+
+    def detect(self, head: bytes) -> bool:
+        """Returns whether a sample starting with head is in the format
+        of the reader.
+        """
+
+        raise NotImplementedError
+
+    def parse(self, chunks):
+        """Yields the records of a sample as (name, bases) tuples.
+
+        The bases of a record may be split over several tuples, which
+        follow each other. They are normalised (see normalise).
+
+        Raises:
+            ValueError: if the sample is not valid.
+        """
+
+        raise NotImplementedError
+
+
+def _lines(chunks, flush: bool = False):
+    """Yields chunks as blocks of whole lines, with the offset of each
+    block in the data.
+
+    When flush is True, only unfinished lines starting with ">" are
+    held back; the other ones are yielded as they come, so a sequence
+    written as a single line is never held whole.
+    """
+
+    offset = 0
+    partial = []
+    for chunk in chunks:
+        if not chunk:
+            continue
+        end = chunk.rfind(b"\n") + 1
+        # The first byte of the unfinished line at the end of the data.
+        line_start = chunk[end:end + 1] if end else (partial or [chunk])[0][:1]
+        if flush and line_start != b">":
+            end = len(chunk)
+        if not end:
+            partial.append(chunk)
+            continue
+        block = b"".join(partial + [chunk[:end]])
+        partial = [chunk[end:]] if end < len(chunk) else []
+        yield offset, block
+        offset += len(block)
+    block = b"".join(partial)
+    if block:
+        yield offset, block
+
+
+class FastaReader(SequenceReader):
+    """Reader of FASTA samples: records made of a ">name" line followed
+    by lines of bases, wrapped at any width.
+    """
+
+    name = "fasta"
+
+    def detect(self, head: bytes) -> bool:
+        return head.lstrip(WHITESPACE).startswith(b">")
+
+    def parse(self, chunks):
+        name = None
+        for _, block in _lines(chunks, flush=True):
+            position = 0
+            for header in _FASTA_HEADER.finditer(block):
+                yield from self._sequence(name, block[position:header.start()])
+                name = _record_name(header.group(1))
+                position = header.end()
+            yield from self._sequence(name, block[position:])
+
+    @staticmethod
+    def _sequence(name, text: bytes):
+        bases = normalise(text)
+        if bases is None or (name is None and bases):
+            raise ValueError("Invalid FASTA sequence.")
+        if bases:
+            yield name, bases
+
+
+class FastqReader(SequenceReader):
+    """Reader of FASTQ samples: records of four lines, "@name", the
+    bases, "+" and their qualities. Sequences wrapped over several
+    lines are not supported.
+    """
+
+    name = "fastq"
+
+    def detect(self, head: bytes) -> bool:
+        return head.lstrip(WHITESPACE).startswith(b"@")
+
+    def parse(self, chunks):
+        name = None
+        line_number = 0
+        for _, block in _lines(chunks):
+            for line in block.splitlines():
+                kind = line_number % 4
+                if kind == 0:
+                    if not line.strip():
+                        continue
+                    if not line.startswith(b"@"):
+                        raise ValueError("Invalid FASTQ header.")
+                    name = _record_name(line[1:])
+                elif kind == 1:
+                    bases = normalise(line)
+                    if bases is None:
+                        raise ValueError("Invalid FASTQ sequence.")
+                    yield name, bases
+                elif kind == 2 and not line.startswith(b"+"):
+                    raise ValueError("Invalid FASTQ separator.")
+                line_number += 1
+        if line_number % 4:
+            raise ValueError("Truncated FASTQ record.")
+
+
+class RawReader(SequenceReader):
+    """Reader of plain samples, like the text .moura files: bases and
+    whitespace only, in a single unnamed record.
+    """
+
+    name = "raw"
+
+    def detect(self, head: bytes) -> bool:
+        head = head.lstrip(WHITESPACE)
+        return not head or head[0] in _LETTERS + _LETTERS.lower()
+
+    def parse(self, chunks):
+        for chunk in chunks:
+            bases = normalise(chunk)
+            if bases is None:
+                raise ValueError("Invalid bases.")
+            if bases:
+                yield None, bases
+
+
+# Tried in order; the first reader detecting a sample reads it.
+READERS = [FastaReader(), FastqReader(), RawReader()]
+
+
+def register_reader(reader: SequenceReader):
+    """Makes a reader available to iter_records. Readers registered
+    later are tried first.
+    """
+
+    READERS.insert(0, reader)
+
+
+def detect_reader(head: bytes):
+    """Returns the first reader detecting a sample starting with head,
+    or None.
+    """
+
+    for reader in READERS:
+        if reader.detect(head):
+            return reader
+    return None
+
+
+def inflate(chunks):
+    """Decompresses chunks of gzip data as they come.
+
+    Several gzip members one after another, like the blocks of bgzip,
+    are decompressed as a single stream.
+
+    Raises:
+        ValueError: if the data is not valid or is truncated.
+    """
+
+    decompressor = zlib.decompressobj(31)
+    # Whether the current member was given data.
+    fed = False
+    try:
+        for data in chunks:
+            fed = fed or bool(data)
+            while True:
+                output = decompressor.decompress(data, INFLATE_LIMIT)
+                yield output
+                if decompressor.eof:
+                    data = decompressor.unused_data
+                    decompressor = zlib.decompressobj(31)
+                    fed = bool(data)
+                    if not data:
+                        break
+                else:
+                    data = decompressor.unconsumed_tail
+                    # A full output may leave more of it inside zlib.
+                    if not data and len(output) < INFLATE_LIMIT:
+                        break
+    except zlib.error as error:
+        raise ValueError(f"Invalid compressed data: {error}") from None
+    if fed:
+        raise ValueError("Truncated compressed data.")
+
+
+def _read_chunks(sample, progress=None, cancel=None):
+    size = os.fstat(sample.fileno()).st_size
+    while chunk := sample.read(CHUNK_SIZE):
+        if cancel is not None:
+            cancel.check()
+        yield chunk
+        if progress is not None:
+            progress(sample.tell(), size)
+
+
+def iter_records(filename: str, progress=None, cancel=None):
+    """Streams the records of a sample in any format of READERS, gzip
+    or bgzip compressed or not.
+
+    Only a chunk of the file is read and decompressed at a time.
+
+    Args:
+
+        filename:
+            Path to the sample.
+
+        progress:
+            An optional function called with the amount of bytes read
+            so far and the size of the file.
+
+        cancel:
+            An optional CancelToken, checked before each chunk.
+
+    Yields:
+        (name, bases) tuples (see SequenceReader.parse).
+
+    Raises:
+        ValueError: if the file is not a valid sample.
+    """
+
+    with open(filename, "rb") as sample:
+        chunks = _read_chunks(sample, progress, cancel)
+        if sample.peek(len(GZIP_MAGIC)).startswith(GZIP_MAGIC):
+            chunks = inflate(chunks)
+        head = b""
+        for chunk in chunks:
+            head += chunk
+            if len(head) >= HEAD_SIZE:
+                break
+        reader = detect_reader(head)
+        if reader is None:
+            raise ValueError(f"{filename} is not in a known format.")
+        yield from reader.parse(itertools.chain([head], chunks))
+
+
+def read_bases(filename: str, progress=None, cancel=None):
+    """Yields the bases of every record of a sample, one after
+    another, in pieces of about CHUNK_SIZE bases.
+
+    The arguments are the ones of iter_records.
+    """
+
+    pieces = []
+    size = 0
+    for _, bases in iter_records(filename, progress, cancel):
+        pieces.append(bases)
+        size += len(bases)
+        if size >= CHUNK_SIZE:
+            yield b"".join(pieces)
+            pieces = []
+            size = 0
+    if pieces:
+        yield b"".join(pieces)
+
+
+class FastaIndex:
+    """Where the bases of each record of a FASTA sample are, like the
+    .fai index of samtools.
+
+    Every line of a record but its last one must hold the same amount
+    of bases, so the offset of any base is found with a division.
+    """
+
+    def __init__(self, records: list):
+        """Initialises the FastaIndex object.
+
+        Args:
+
+            records:
+                A (name, length, offset, line_bases, line_width) tuple
+                per record: its amount of bases, the offset of its
+                first base in the data, and the amount of bases and of
+                bytes of its lines.
+        """
+
+        self.records = records
+        # Position of the first base of each record in the genome.
+        self.starts = list(itertools.accumulate(
+            (record[1] for record in records), initial=0))
+
+    @property
+    def length(self) -> int:
+        return self.starts[-1]
+
+    @classmethod
+    def read(cls, path: str, size: int):
+        """Reads a .fai file, as written by samtools faidx.
+
+        Args:
+
+            path:
+                Path to the .fai file.
+
+            size:
+                The size of the (decompressed) FASTA data, which every
+                record must fit in.
+
+        Returns:
+            The FastaIndex, or None if the file is missing or invalid.
+        """
+
+        records = []
+        try:
+            with open(path) as index_file:
+                for line in index_file:
+                    fields = line.rstrip("\r\n").split("\t")
+                    name = fields[0]
+                    length, offset, line_bases, line_width = \
+                        map(int, fields[1:5])
+                    if length and (line_bases <= 0 or line_width < line_bases
+                                   or offset + length > size):
+                        return None
+                    records.append((name, length, offset, line_bases,
+                                    line_width))
+        except (OSError, ValueError, IndexError):
+            return None
+        return cls(records)
+
+    @classmethod
+    def scan(cls, chunks):
+        """Indexes FASTA data in a single pass over it.
+
+        Raises:
+            ValueError: if the data is not valid FASTA, or the lines of
+                a record do not all have the same width.
+        """
+
+        records = []
+        record = None
+        for offset, block in _lines(chunks):
+            position = 0
+            for header in _FASTA_HEADER.finditer(block):
+                cls._add_lines(record, block[position:header.start()],
+                               offset + position)
+                record = [_record_name(header.group(1)), 0,
+                          offset + header.end(), 0, 0, False]
+                records.append(record)
+                position = header.end()
+            cls._add_lines(record, block[position:], offset + position)
+        return cls([tuple(record[:5]) for record in records])
+
+    @staticmethod
+    def _add_lines(record: list, text: bytes, offset: int):
+        # The lines are added to record, a list of the fields of
+        # FastaIndex.records followed by whether a short line ended it.
+        lines = text.rstrip(WHITESPACE)
+        if not lines:
+            if text and record is not None:
+                record[5] = True
+            return
+        bases = normalise(lines)
+        if record is None or bases is None or text[:1] in WHITESPACE:
+            raise ValueError("Invalid FASTA sequence.")
+        if record[5]:
+            raise ValueError("Lines of different widths in a record.")
+        if not record[4]:
+            line = text[:text.find(b"\n") + 1 or len(text)]
+            record[2] = offset
+            record[3] = len(line.rstrip(WHITESPACE))
+            record[4] = len(line)
+        line_bases, line_width = record[3], record[4]
+
+        full_lines = lines.count(b"\n")
+        last = len(lines) - full_lines * line_width
+        if lines[line_width - 1::line_width][:full_lines] \
+                != b"\n" * full_lines \
+                or not 0 < last <= line_bases \
+                or len(bases) != full_lines * line_bases + last:
+            raise ValueError("Lines of different widths in a record.")
+        record[1] += len(bases)
+        # Only the last line of a record may be short, and blank
+        # lines end the record as well.
+        record[5] = last < line_bases \
+            or text.count(b"\n", len(lines)) > 1
+
+    def locate(self, record: int, position: int) -> int:
+        """Returns the offset in the data of a base of a record."""
+
+        _, _, offset, line_bases, line_width = self.records[record]
+        return offset + position // line_bases * line_width \
+            + position % line_bases
+
+
+class IndexedGenome(Genome):
+    """A genome read straight from a FASTA sample through its
+    FastaIndex.
+
+    The data is a memory-mapped file, or a BgzfFile for bgzip samples,
+    so only the blocks holding the bases asked for are decompressed.
+    The records of the sample follow each other in the genome. Slices
+    share the data and the index.
+    """
+
+    def __init__(self, buffer, index: FastaIndex, length: int = None,
+                 start: int = 0):
+        """Initialises the IndexedGenome object.
+
+        Args:
+
+            buffer:
+                The FASTA data: anything that can be sliced, like a
+                mmap or a BgzfFile.
+
+            index:
+                The FastaIndex of the data.
+
+            length:
+                The amount of bases in the genome. When None, the
+                length of the whole index.
+
+            start:
+                Position of the first base of the genome in the index.
+        """
+
+        self.buffer = buffer
+        self.index = index
+        self.length = index.length if length is None else length
+        self.start = start
+
+    def tobytes(self, start: int = 0, stop: int = None) -> bytes:
+        """Returns the bases between start and stop as ASCII."""
+
+        stop = self.length if stop is None else min(stop, self.length)
+        if start >= stop:
+            return b""
+        first, last = self.start + start, self.start + stop
+        starts = self.index.starts
+        record = bisect.bisect_right(starts, first) - 1
+        parts = []
+        while first < last:
+            begin = first - starts[record]
+            end = min(last, starts[record + 1]) - starts[record]
+            if begin < end:
+                parts.append(self.buffer[
+                    self.index.locate(record, begin):
+                    self.index.locate(record, end - 1) + 1])
+            first = starts[record + 1]
+            record += 1
+        return b"".join(parts).translate(_NORMALISE, WHITESPACE)
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self.length)
+            if step != 1:
+                return PackedGenome.from_bases(self.tobytes()[key])
+            return IndexedGenome(self.buffer, self.index,
+                                 max(stop - start, 0), self.start + start)
+
+        if key < 0:
+            key += self.length
+        if not 0 <= key < self.length:
+            raise IndexError("genome index out of range")
+        return self.tobytes(key, key + 1).decode("ascii")
+
+
+def _buffer_chunks(buffer, progress=None, cancel=None):
+    for start in range(0, len(buffer), CHUNK_SIZE):
+        if cancel is not None:
+            cancel.check()
+        yield buffer[start:start + CHUNK_SIZE]
+        if progress is not None:
+            progress(min(start + CHUNK_SIZE, len(buffer)), len(buffer))
+
+
+def open_indexed(filename: str, progress=None, cancel=None):
+    """Opens a FASTA sample, plain or bgzip compressed, for random
+    access.
+
+    The .fai index next to the sample is used when there is one;
+    otherwise the sample is indexed in a single pass, without ever
+    holding more than a few blocks of it.
+
+    Args:
+
+        filename:
+            Path to the sample.
+
+        progress, cancel:
+            Optional progress callback, called with the amount of
+            bytes indexed and the size of the data, and CancelToken.
+
+    Returns:
+        An IndexedGenome, or None if the sample cannot be read at
+        random (it is not FASTA, it is gzip but not bgzip compressed,
+        or its lines are not regular).
+    """
+
+    with open(filename, "rb") as sample:
+        head = sample.read(HEAD_SIZE)
+        if not head:
+            return None
+        if head.startswith(GZIP_MAGIC):
+            if bgzf.block_size(head) is None:
+                return None
+            try:
+                buffer = bgzf.BgzfFile(filename)
+            except ValueError:
+                return None
+            head = buffer[:HEAD_SIZE]
+        else:
+            buffer = mmap.mmap(sample.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if not FastaReader().detect(head):
+        buffer.close()
+        return None
+    index = FastaIndex.read(filename + ".fai", len(buffer))
+    try:
+        if index is None:
+            index = FastaIndex.scan(_buffer_chunks(buffer, progress, cancel))
+    except ValueError:
+        buffer.close()
+        return None
+    except Cancelled:
+        buffer.close()
+        raise
+    return IndexedGenome(buffer, index)
@@ -0,0 +1,388 @@
+"""Module with the samples of DNA, without anything related to
+drawing them.
+"""
+
+import collections
+import fractions
+import math
+import mmap
+import os
+
+from . import align, engine, moura, readers
+from .genome import BASES, UNKNOWN, MappedGenome, PackedGenome
+from .profiler import profiler
+from .readers import CHUNK_SIZE, WHITESPACE
+from .sketch import Sketch
+
+# Amount of memory-mapped samples kept open for fast reloading.
+MAX_MAPPED_SAMPLES = 8
+_mapped_samples = collections.OrderedDict()
+
+
+class Sample:
+    """A DNA sample loaded from a file."""
+
+    def __init__(self, file: str, mode: str = "stream", cache=None,
+                 progress=None, cancel=None):
+        """Initialises the Sample object.
+
+        Args:
+
+            file:
+                Path to a sample, in any format of readers.READERS.
+
+            mode:
+                The loading mode given to get_genome.
+
+            cache:
+                An optional SampleCache.
+
+            progress, cancel:
+                Optional progress callback and CancelToken, given to
+                load_sample.
+
+        Raises:
+            ValueError: if the file is not a DNA sample.
+            progress.Cancelled: if the loading was cancelled.
+        """
+
+        sample = Sample.load_sample(file, mode, cache, progress, cancel)
+        if sample is None:
+            raise ValueError(f"{file} is not a DNA sample.")
+        self.file = file
+        self.cache = cache
+        self.genome, self._sketch, self.stats = sample
+
+    @property
+    def sketch(self) -> Sketch:
+        """The sketch of the sample, computed when first used."""
+
+        return self.get_sketch()
+
+    def get_sketch(self, cancel=None, progress=None) -> Sketch:
+        """Returns the sketch of the sample.
+
+        Sketching takes a pass over every base in Python, so it is
+        done the first time the sketch is asked for rather than by
+        load_sample; the sketch is then added to the cache of the
+        sample, if any.
+
+        Args:
+
+            cancel, progress:
+                An optional CancelToken and progress function, used
+                while the sample is sketched (see
+                sketch.canonical_kmers).
+        """
+
+        if self._sketch is None:
+            self._sketch = Sketch.from_genome(self.genome, cancel=cancel,
+                                              progress=progress)
+            if self.cache is not None:
+                self.cache.put_sketch(self.cache.key(self.file),
+                                      self._sketch)
+        return self._sketch
+
+    @staticmethod
+    def load_sample(filename: str, mode: str = "stream", cache=None,
+                    progress=None, cancel=None):
+        """Loads a sample together with its summary stats, and its
+        sketch when it is cached.
+
+        Args:
+
+            filename:
+                Path to a sample, in any format of readers.READERS.
+
+            mode:
+                The loading mode given to get_genome.
+
+            cache:
+                An optional SampleCache. Samples found in it are not
+                parsed again, unless only their stats were cached
+                because they were mapped.
+
+            progress:
+                An optional function called with the amount of bytes
+                read so far and the size of the file.
+
+            cancel:
+                An optional CancelToken, checked while the sample is
+                read.
+
+        Returns:
+            A (genome, sketch, stats) tuple, or None if the file is not
+            a valid DNA sample. The sketch is None unless it was
+            cached (see get_sketch).
+        """
+
+        if cache is not None:
+            key = cache.key(filename)
+            sample = cache.get(key)
+            if sample is not None:
+                genome, sketch, stats = sample
+                # Mapped samples stay mapped, so they are shared with
+                # the other samples of the file instead of copied.
+                if mode == "mmap":
+                    mapped = Sample.map_genome(filename, progress, cancel)
+                    if mapped is not False:
+                        genome = mapped
+                if genome is None:
+                    genome = Sample.get_genome(filename, "stream", progress,
+                                               cancel)
+                    if genome is None:
+                        return None
+                    if not Sample.is_mapped(genome):
+                        cache.put(key, genome, sketch, stats)
+                return genome, sketch, stats
+
+        genome = Sample.get_genome(filename, mode, progress, cancel)
+        if genome is None:
+            return None
+        sample = genome, None, Sample.get_stats(genome)
+        if cache is not None:
+            cache.put(key, None if Sample.is_mapped(genome) else genome,
+                      *sample[1:])
+        return sample
+
+    @staticmethod
+    def is_mapped(genome) -> bool:
+        """Returns whether a genome reads its bases from its file."""
+
+        return not isinstance(genome, PackedGenome) \
+            or isinstance(genome.data, memoryview)
+
+    @staticmethod
+    def get_stats(genome) -> dict:
+        """Returns the summary stats of a genome: its length, the count
+        of each base and its GC content.
+        """
+
+        counts = genome.base_counts()
+        return {
+            "length": len(genome),
+            "counts": counts,
+            "gc_content": (counts["G"] + counts["C"]) / len(genome)
+            if len(genome) else 0.0
+        }
+
+    @staticmethod
+    @profiler.timed("get_genome")
+    def get_genome(filename: str, mode: str = "stream", progress=None,
+                   cancel=None):
+        """Loads the whole genome of a sample file.
+
+        The format of the sample is told by its first bytes (see
+        readers.READERS), and gzip or bgzip compressed samples are
+        decompressed as they are read. The records of FASTA and FASTQ
+        samples follow each other in the genome.
+
+        In "stream" mode the file is read CHUNK_SIZE bytes at a time
+        and every chunk is validated and packed before the next one is
+        read, so the raw text is never kept alongside the sequence.
+
+        In "mmap" mode the file is memory-mapped and the bases are
+        read from the page cache; FASTA samples, plain or bgzip
+        compressed, are read through an index of their lines. Samples
+        that cannot be read at random, like plain gzip or FASTQ ones,
+        are streamed instead.
+
+        Binary .moura samples (see moura) are already packed: they are
+        mapped in "mmap" mode and copied block by block in "stream"
+        mode. Only copied samples have their blocks checked against
+        their checksums, so mapping a sample does not read it whole.
+
+        Args:
+
+            filename:
+                Path to a sample, in any format of readers.READERS.
+
+            mode:
+                Either "stream" or "mmap".
+
+            progress, cancel:
+                Optional progress callback and CancelToken (see
+                load_sample).
+
+        Returns:
+            A PackedGenome (or MappedGenome or readers.IndexedGenome)
+            with the bases of the sample, or None if the file is not a
+            valid DNA sample.
+        """
+
+        if mode == "mmap":
+            genome = Sample.map_genome(filename, progress, cancel)
+            if genome is not False:
+                return genome
+        elif mode != "stream":
+            raise ValueError(f"Unknown loading mode: {mode}")
+
+        with open(filename, "rb") as dna_sample:
+            binary = moura.is_binary(dna_sample.read(len(moura.MAGIC)))
+        if binary:
+            try:
+                return moura.read_genome(filename, False, progress, cancel)
+            except ValueError:
+                return None
+
+        genome = PackedGenome()
+        try:
+            for bases in readers.read_bases(filename, progress, cancel):
+                genome.extend(bases)
+        except ValueError:
+            return None
+        return genome
+
+    @staticmethod
+    def map_genome(filename: str, progress=None, cancel=None):
+        """Memory-maps a sample file.
+
+        Mapped samples are remembered, so mapping a file that did not
+        change since the last call costs a stat call only.
+
+        Returns:
+            A MappedGenome (or readers.IndexedGenome for FASTA
+            samples, or a PackedGenome for binary .moura ones), None
+            if the file is not a valid DNA sample or False if the file
+            cannot be mapped.
+        """
+
+        path = os.path.abspath(filename)
+        stat = os.stat(path)
+        key = (path, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        if key in _mapped_samples:
+            _mapped_samples.move_to_end(key)
+            return _mapped_samples[key]
+        if stat.st_size == 0:
+            return False
+
+        with open(path, "rb") as dna_sample:
+            head = dna_sample.read(readers.HEAD_SIZE)
+            if moura.is_binary(head):
+                try:
+                    genome = moura.read_genome(path, True, progress, cancel)
+                except ValueError:
+                    return None
+                return Sample._remember(key, genome)
+            if not isinstance(readers.detect_reader(head), readers.RawReader):
+                genome = readers.open_indexed(path, progress, cancel)
+                if genome is None:
+                    return False
+                return Sample._remember(key, genome)
+            buffer = mmap.mmap(dna_sample.fileno(), 0, access=mmap.ACCESS_READ)
+        length = len(buffer)
+        while length and buffer[length - 1] in WHITESPACE:
+            length -= 1
+        for start in range(0, length, CHUNK_SIZE):
+            if cancel is not None and cancel.cancelled:
+                buffer.close()
+                cancel.check()
+            chunk = buffer[start:min(start + CHUNK_SIZE, length)]
+            if chunk.translate(None, BASES + UNKNOWN):
+                # Line breaks and lower case bases are left to
+                # get_genome, which also rejects the invalid samples.
+                buffer.close()
+                return False
+            if progress is not None:
+                progress(start + len(chunk), length)
+
+        return Sample._remember(key, MappedGenome(buffer, length))
+
+    @staticmethod
+    def _remember(key: tuple, genome):
+        _mapped_samples[key] = genome
+        if len(_mapped_samples) > MAX_MAPPED_SAMPLES:
+            _mapped_samples.popitem(last=False)
+        return genome
+
+    def save(self, filename: str, cancel=None):
+        """Writes the genome of the sample as a binary .moura file.
+
+        Args:
+
+            filename:
+                Path of the file.
+
+            cancel:
+                An optional CancelToken, checked before each block.
+        """
+
+        moura.write_genome(filename, self.genome, cancel=cancel)
+
+    @staticmethod
+    @profiler.timed("match")
+    def match(sample1, sample2, engine_name: str = None,
+              threshold: float = None, progress=None, cancel=None) -> float:
+        """Returns how similar two samples are, from 0 to 1.
+
+        Args:
+
+            sample1, sample2:
+                The samples (Sample or DNA objects) to be compared.
+
+            engine_name:
+                Name of the matching engine to use (see
+                engine.ENGINES). When None, the default engine is
+                used.
+
+            threshold:
+                Optional minimum ratio. When given, the bounded
+                distance of the engine is used, which gives up as soon
+                as the ratio cannot reach the threshold.
+
+            progress, cancel:
+                Optional progress callback and CancelToken given to the
+                engine (see engine.MatchEngine).
+
+        Returns:
+            The ratio, or None if it is below threshold.
+
+        Raises:
+            progress.Cancelled: if the matching was cancelled.
+        """
+
+        matching_engine = engine.get_engine(engine_name)
+        if threshold is None:
+            return matching_engine.ratio(sample1.genome, sample2.genome,
+                                         progress, cancel)
+
+        total = len(sample1.genome) + len(sample2.genome)
+        if not total:
+            return 1.0
+        # The threshold is taken as written, so that 0.8 of 10 allows a
+        # distance of 2 rather than the 1 of float arithmetic.
+        max_distance = math.floor(
+            (1 - fractions.Fraction(str(threshold))) * total)
+        distance = matching_engine.bounded_distance(
+            sample1.genome, sample2.genome, max_distance, progress, cancel)
+        if distance is None:
+            return None
+        return 1.0 - distance / total
+
+    @staticmethod
+    def estimate(sample1, sample2, cancel=None) -> float:
+        """Estimates how similar two samples are, from 0 to 1.
+
+        It compares the sketches of the samples, so once they are
+        sketched it takes the same time whatever the length of the
+        samples. The estimate is the Jaccard index of the k-mers of the
+        samples.
+
+        An optional CancelToken stops the sketching of the samples.
+        """
+
+        return sample1.get_sketch(cancel).jaccard(sample2.get_sketch(cancel))
+
+    @staticmethod
+    def align(sample1, sample2, progress=None, cancel=None) -> list:
+        """Aligns two samples in linear memory.
+
+        An optional progress callback and CancelToken are given to
+        align.align.
+
+        Returns:
+            The edit script turning sample1 into sample2 (see
+            align.align).
+        """
+
+        return align.align(sample1.genome, sample2.genome, progress, cancel)
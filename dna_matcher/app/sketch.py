@@ -0,0 +1,137 @@
+"""Module for estimating the similarity of genomes from sketches."""
+
+import heapq
+import math
+
+from .genome import BASES
+
+KMER_SIZE = 21
+SKETCH_SIZE = 1000
+
+_MASK64 = (1 << 64) - 1
+# Turns ASCII bases into codes, A=0, C=1, G=2 and T=3. Anything else
+# becomes 4 and breaks the k-mers that go over it.
+_CODES = bytes(BASES.index(code) if code in BASES else 4
+               for code in range(256))
+
+
+def hash_kmer(kmer: int) -> int:
+    """Scrambles a 2-bit encoded k-mer into a 64-bit hash (the
+    finaliser of MurmurHash3).
+    """
+
+    kmer = (kmer ^ (kmer >> 33)) * 0xff51afd7ed558ccd & _MASK64
+    kmer = (kmer ^ (kmer >> 33)) * 0xc4ceb9fe1a85ec53 & _MASK64
+    return kmer ^ (kmer >> 33)
+
+
+def canonical_kmers(genome, kmer_size: int = KMER_SIZE, cancel=None,
+                    progress=None):
+    """Yields the canonical k-mers of a genome, 2-bit encoded.
+
+    The canonical k-mer is the smallest of a k-mer and its reverse
+    complement, so a sample and its opposite strand give the same
+    k-mers. An optional CancelToken is checked, and an optional
+    progress function called with the amount of bases read so far and
+    the length of the genome, before each chunk of the genome.
+    """
+
+    mask = (1 << 2 * kmer_size) - 1
+    shift = 2 * (kmer_size - 1)
+    forward = reverse = 0
+    valid = 0
+    done = 0
+    for chunk in genome.iter_chunks():
+        if cancel is not None:
+            cancel.check()
+        if progress is not None:
+            progress(done, len(genome))
+        done += len(chunk)
+        for code in chunk.translate(_CODES):
+            if code == 4:
+                valid = 0
+                continue
+            forward = (forward << 2 | code) & mask
+            reverse = reverse >> 2 | (3 - code) << shift
+            valid += 1
+            if valid >= kmer_size:
+                yield min(forward, reverse)
+
+
+class Sketch:
+    """A bottom-k MinHash sketch of a genome.
+
+    It keeps the smallest hashes of the canonical k-mers of a genome,
+    which is enough to estimate the Jaccard index of two genomes in a
+    time that does not depend on their lengths.
+    """
+
+    def __init__(self, hashes, kmer_size: int = KMER_SIZE,
+                 size: int = SKETCH_SIZE):
+        """Initialises the Sketch object.
+
+        Args:
+
+            hashes:
+                The hashes kept by the sketch.
+
+            kmer_size:
+                The length of the k-mers that were hashed.
+
+            size:
+                The maximum amount of hashes kept.
+        """
+
+        self.hashes = sorted(hashes)
+        self.kmer_size = kmer_size
+        self.size = size
+
+    @classmethod
+    def from_genome(cls, genome, kmer_size: int = KMER_SIZE,
+                    size: int = SKETCH_SIZE, cancel=None, progress=None):
+        """Sketches a genome in a single pass over its bases.
+
+        An optional CancelToken stops the sketching, and an optional
+        progress function follows it (see canonical_kmers).
+        """
+
+        # Max-heap (with negated values) of the smallest hashes seen.
+        heap = []
+        kept = set()
+        for kmer in canonical_kmers(genome, kmer_size, cancel, progress):
+            value = hash_kmer(kmer)
+            if value in kept:
+                continue
+            if len(heap) < size:
+                heapq.heappush(heap, -value)
+                kept.add(value)
+            elif value < -heap[0]:
+                kept.discard(-heapq.heapreplace(heap, -value))
+                kept.add(value)
+        return cls(kept, kmer_size, size)
+
+    def jaccard(self, other) -> float:
+        """Estimates the Jaccard index of the k-mers of two genomes."""
+
+        if self.kmer_size != other.kmer_size:
+            raise ValueError("Sketches of different k-mer sizes.")
+        size = min(self.size, other.size)
+        union = heapq.nsmallest(size, set(self.hashes) | set(other.hashes))
+        if not union:
+            return 1.0
+        shared = set(self.hashes) & set(other.hashes)
+        return sum(value in shared for value in union) / len(union)
+
+    def mash_distance(self, other) -> float:
+        """Estimates the mutation rate between two genomes (the Mash
+        distance), from 0 (identical) to 1.
+        """
+
+        jaccard = self.jaccard(other)
+        if jaccard == 0:
+            return 1.0
+        distance = -math.log(2 * jaccard / (1 + jaccard)) / self.kmer_size
+        return min(distance, 1.0)
+
+    def __len__(self):
+        return len(self.hashes)
@@ -0,0 +1,98 @@
+"""Module for summarising long genomes at several zoom levels."""
+
+import array
+
+from .genome import BASES
+
+# Amount of bases summarised by a tile of the finest level.
+TILE_BASES = 1 << 10
+# Amount of tiles of a level merged into a tile of the next one.
+LEVEL_FACTOR = 4
+
+
+class SummaryPyramid:
+    """Base counts of the tiles of a genome, like a mipmap.
+
+    Level 0 holds the counts of every TILE_BASES bases; each following
+    level merges LEVEL_FACTOR tiles of the previous one, until a single
+    tile covers the whole genome. A window of any width can then be
+    summarised from a handful of tiles, without reading its bases.
+    """
+
+    def __init__(self, levels: list, length: int,
+                 tile_bases: int = TILE_BASES):
+        """Initialises the SummaryPyramid object.
+
+        Args:
+
+            levels:
+                One array per level, with the counts of A, C, G and T
+                of each tile one after another.
+
+            length:
+                The length of the genome.
+
+            tile_bases:
+                The amount of bases of a tile of level 0.
+        """
+
+        self.levels = levels
+        self.length = length
+        self.tile_bases = tile_bases
+
+    @classmethod
+    def from_genome(cls, genome, tile_bases: int = TILE_BASES, cancel=None):
+        """Summarises a genome in a single pass over its bases.
+
+        An optional CancelToken is checked before each chunk of the
+        genome.
+        """
+
+        counts = array.array("Q")
+        chunk_size = tile_bases * 64
+        codes = [bytes([base]) for base in BASES]
+        for chunk in genome.iter_chunks(chunk_size):
+            if cancel is not None:
+                cancel.check()
+            for start in range(0, len(chunk), tile_bases):
+                tile = chunk[start:start + tile_bases]
+                counts.extend(tile.count(code) for code in codes)
+
+        levels = [counts]
+        while len(levels[-1]) > len(BASES):
+            previous = levels[-1]
+            step = LEVEL_FACTOR * len(BASES)
+            levels.append(array.array("Q", (
+                sum(previous[first + base:first + step:len(BASES)])
+                for first in range(0, len(previous), step)
+                for base in range(len(BASES))
+            )))
+        return cls(levels, len(genome), tile_bases)
+
+    def level_bases(self, level: int) -> int:
+        """Returns the amount of bases of a tile of a level."""
+
+        return self.tile_bases * LEVEL_FACTOR ** level
+
+    def level_for(self, bases: float) -> int:
+        """Returns the coarsest level whose tiles hold at most the
+        given amount of bases.
+        """
+
+        level = 0
+        while level + 1 < len(self.levels) \
+                and self.level_bases(level + 1) <= bases:
+            level += 1
+        return level
+
+    def counts(self, level: int, start: int, stop: int) -> list:
+        """Returns the counts of A, C, G and T of the tiles of a level
+        that overlap the bases between start and stop.
+        """
+
+        tile_bases = self.level_bases(level)
+        tiles = self.levels[level]
+        first = start // tile_bases * len(BASES)
+        last = min(-(-stop // tile_bases) * len(BASES), len(tiles))
+        return [sum(tiles[first + base:last:len(BASES)])
+                for base in range(len(BASES))]
@@ -0,0 +1,65 @@
+"""Module with the clocks that drive the timers of the scenes."""
+
+import pygame.time as time
+
+
+class Clock:
+    """The real clock, backed by pygame.time."""
+
+    def set_timer(self, event_type, millis, loops=0):
+        """Posts an event every millis milliseconds, loops times (0
+        means forever). A delay of 0 stops the timer.
+        """
+
+        time.set_timer(event_type, millis, loops)
+
+    def get_ticks(self) -> int:
+        """Returns the milliseconds since the clock started."""
+
+        return time.get_ticks()
+
+
+class VirtualClock(Clock):
+    """A clock that only moves when it is advanced, so scenes can be
+    stepped faster than real time and always see the same timings.
+    """
+
+    def __init__(self):
+        self.ticks = 0
+        # [due tick, interval, loops left] of each timer, by event
+        # type. A loops left of 0 means forever.
+        self.timers = dict()
+
+    def set_timer(self, event_type, millis, loops=0):
+        if millis <= 0:
+            self.timers.pop(event_type, None)
+        else:
+            self.timers[event_type] = [self.ticks + millis, millis, loops]
+
+    def get_ticks(self) -> int:
+        return self.ticks
+
+    def advance(self, millis) -> list:
+        """Moves the clock forward.
+
+        Returns:
+            The event types of the timers that went off, in the order
+            they did.
+        """
+
+        self.ticks += millis
+        fired = []
+        while True:
+            due = [(timer[0], event_type)
+                   for event_type, timer in self.timers.items()
+                   if timer[0] <= self.ticks]
+            if not due:
+                return fired
+            tick, event_type = min(due)
+            fired.append(event_type)
+            timer = self.timers[event_type]
+            if timer[2] == 1:
+                del self.timers[event_type]
+            else:
+                timer[0] = tick + timer[1]
+                timer[2] = max(timer[2] - 1, 0)
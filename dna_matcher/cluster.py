@@ -0,0 +1,104 @@
+"""Headless all-vs-all matcher and sample clustering.
+
+Usage: python -m dna_matcher.cluster samples_dir --matrix matrix.npy
+
+The distance matrix is written while it is computed; running the same
+command again resumes it. Nothing in here imports pygame.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from .app import engine, matrix, readers
+from .app.sample import Sample
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m dna_matcher.cluster",
+        description="Match every pair of samples and cluster them.")
+    parser.add_argument("samples", nargs="+",
+                        help="sample files, or directories of samples")
+    parser.add_argument("--matrix", required=True,
+                        help="the .npy file of the condensed distances")
+    parser.add_argument("--method", choices=("single", "average"),
+                        default="average",
+                        help="single linkage or UPGMA (average)")
+    parser.add_argument("--threshold", type=float, default=0.3,
+                        help="distance under which samples are clustered")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--tile-size", type=int, default=matrix.TILE_SIZE)
+    parser.add_argument("--engine", choices=sorted(engine.ENGINES),
+                        default=None)
+    parser.add_argument("--match-all", action="store_true",
+                        help="match every pair exactly, even those whose "
+                             "sketches share no k-mer")
+    parser.add_argument("--json", action="store_true",
+                        help="print the linkage and clusters as JSON")
+    return parser.parse_args(argv)
+
+
+def find_samples(paths) -> list:
+    """Expands directories into the sample files they contain (see
+    readers.is_sample_file).
+    """
+
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name)
+                         for name in sorted(os.listdir(path))
+                         if readers.is_sample_file(name))
+        else:
+            files.append(path)
+    return files
+
+
+def main(argv=None) -> int:
+    """Command line entry of the clustering tool.
+
+    Returns:
+        The exit status.
+    """
+
+    args = parse_args(argv)
+    files = find_samples(args.samples)
+    try:
+        samples = [Sample(path, "mmap") for path in files]
+    except (OSError, ValueError) as error:
+        print(error, file=sys.stderr)
+        return 1
+
+    total = matrix.condensed_size(len(samples))
+    try:
+        for done in matrix.compute_matrix(samples, args.matrix,
+                                          args.workers, args.tile_size,
+                                          args.engine, not args.match_all):
+            print(f"{done}/{total} pairs", file=sys.stderr)
+    except ValueError as error:
+        print(error, file=sys.stderr)
+        return 1
+
+    distances = matrix.DistanceMatrix(args.matrix, len(samples))
+    values = distances.values()
+    distances.close()
+    linkage = matrix.linkage(values, len(samples), args.method)
+    numbers = matrix.flat_clusters(linkage, len(samples), args.threshold)
+    clusters = [[] for _ in range(max(numbers, default=-1) + 1)]
+    for path, number in zip(files, numbers):
+        clusters[number].append(path)
+
+    if args.json:
+        json.dump({"samples": files, "linkage": linkage,
+                   "clusters": clusters}, sys.stdout, indent=2)
+        print()
+    else:
+        for number, cluster in enumerate(clusters):
+            print(number, *cluster, sep="\t")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""Converter of samples to the binary .moura format.
+
+Usage: python -m dna_matcher.convert sample.fa sample.moura
+
+Any sample the app reads (text .moura, FASTA or FASTQ, compressed or
+not) is streamed into a binary .moura file, which takes about a
+quarter of the space of the text and is mapped in one go when loaded.
+Nothing in here imports pygame.
+"""
+
+import argparse
+import os
+import sys
+
+from .app import moura, readers
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m dna_matcher.convert",
+        description="Convert a sample to the binary .moura format.")
+    parser.add_argument("sample", help="the sample to convert")
+    parser.add_argument("output", help="the binary .moura file written")
+    parser.add_argument("--block-bases", type=int,
+                        default=moura.BLOCK_BASES,
+                        help="bases of each checksummed block, a multiple "
+                             "of 4")
+    return parser.parse_args(argv)
+
+
+def convert(path: str, output: str, block_bases: int = moura.BLOCK_BASES,
+            progress=None, cancel=None) -> int:
+    """Converts a sample to a binary .moura file.
+
+    Args:
+
+        path:
+            The sample, in any format of readers.READERS.
+
+        output:
+            Path of the binary .moura file. It is only replaced once
+            the whole sample was converted.
+
+        block_bases:
+            The amount of bases of a block.
+
+        progress, cancel:
+            Optional progress callback and CancelToken (see
+            readers.iter_records).
+
+    Returns:
+        The amount of bases written.
+
+    Raises:
+        ValueError: if the sample is not valid.
+    """
+
+    if os.path.abspath(path) == os.path.abspath(output):
+        raise ValueError("The sample cannot be converted in place.")
+    with open(path, "rb") as sample_file:
+        if moura.is_binary(sample_file.read(len(moura.MAGIC))):
+            raise ValueError(f"{path} is a binary .moura file already.")
+    with moura.MouraWriter(output, block_bases) as writer:
+        for bases in readers.read_bases(path, progress, cancel):
+            writer.write(bases)
+    return writer.length
+
+
+def main(argv=None) -> int:
+    """Command line entry of the converter.
+
+    Returns:
+        The exit status.
+    """
+
+    args = parse_args(argv)
+    try:
+        length = convert(args.sample, args.output, args.block_bases)
+    except (OSError, ValueError) as error:
+        print(error, file=sys.stderr)
+        return 1
+    print(f"{args.output}: {length} bases, "
+          f"{os.path.getsize(args.sample)} -> "
+          f"{os.path.getsize(args.output)} bytes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
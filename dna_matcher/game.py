@@ -1,18 +1,63 @@
 """game module."""
 
+import sys
+import time
+
 import pygame
 
-from . import scene, utils
+from . import interface, scene, utils
+from .app.profiler import profiler
+
+# Where F4 writes the trace of the profiler.
+TRACE_PATH = "frame_trace.json"
+SCREEN_SIZE = (1280, 768)
+
+
+def setup_scenes(screen, clock=None, initial_view="game_intro"):
+    """Creates the scene manager of the game.
+
+    Args:
 
+        screen:
+            The Surface object where the scenes are drawn.
 
-def main() -> None:
-    """Main Program."""
+        clock:
+            The Clock given to the scenes. When None, the real one.
+
+        initial_view:
+            The view shown first.
+
+    Returns:
+        The SceneManager. The debug scene is only built when it is
+        needed, or while the intro is shown.
+    """
+
+    def build_debug_scene():
+        # The buttons of the scene share an atlas.
+        utils.assets.pack_atlas(utils.assets.preload("matcher_view"))
+        return scene.DebugScene(screen, clock)
+
+    scene_manager = scene.SceneManager()
+    scene_manager.add("game_intro", lambda: scene.IntroScene(screen, clock))
+    scene_manager.add("main_menu", build_debug_scene)
+    scene_manager.initial_view(initial_view)
+    return scene_manager
+
+
+def main(started: float = None) -> None:
+    """Main Program.
+
+    Args:
+
+        started:
+            The time.perf_counter value when the game was launched.
+            When given, the time it took to show the first frame is
+            printed to stderr.
+    """
 
     pygame.init()
 
     # Pygame setup
-    SCREEN_SIZE = (1280, 768)
-
     clock = pygame.time.Clock()
     screen = pygame.display.set_mode(SCREEN_SIZE)
 
@@ -20,25 +65,47 @@ def main() -> None:
     pygame.display.set_icon(utils.load_image("icon.png"))
 
     # Game setup
-    scene_manager = scene.SceneManager()
-    intro_scene = scene.IntroScene(screen)
-    debug_scene = scene.DebugScene(screen)
-    scene_manager.add("game_intro", intro_scene)
-    scene_manager.add("main_menu", debug_scene)
-    scene_manager.initial_view("game_intro")
+    scene_manager = setup_scenes(screen)
+
+    # F3 shows the frame times, F4 saves them as a Chrome trace.
+    overlay = None
 
     running = True
     while running:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-            scene_manager.update_on_event(event)
+        frame_start = time.perf_counter()
+        with profiler.span("events"):
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    running = False
+                elif event.type == pygame.KEYDOWN \
+                        and event.key == pygame.K_F3:
+                    overlay = None if overlay is not None \
+                        else interface.ProfilerOverlay(screen)
+                    profiler.enabled = overlay is not None
+                    scene_manager.get(scene_manager.current_view).invalidate()
+                elif event.type == pygame.KEYDOWN \
+                        and event.key == pygame.K_F4:
+                    profiler.export(TRACE_PATH)
+                    print(f"Trace written to {TRACE_PATH}", file=sys.stderr)
+                scene_manager.update_on_event(event)
 
         # Game loop
-        scene_manager.show()
+        dirty_rects = scene_manager.show()
         scene_manager.update()
+        if overlay is not None:
+            overlay_rect = overlay.draw(frame_start)
+            if dirty_rects is not None:
+                dirty_rects.append(overlay_rect)
 
-        pygame.display.update()
+        with profiler.span("display"):
+            pygame.display.update(dirty_rects)
+        if started is not None:
+            print(f"First frame after {time.perf_counter() - started:.3f} s",
+                  file=sys.stderr)
+            started = None
+        scene_manager.build_pending()
+        if profiler.enabled:
+            profiler.record("frame", frame_start, time.perf_counter())
         clock.tick(60)
 
     pygame.quit()
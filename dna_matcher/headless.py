@@ -0,0 +1,262 @@
+"""Headless driver of the scenes, stepped with a virtual clock.
+
+Usage: python -m dna_matcher.headless a.moura b.moura -o report.png
+
+The scenes are drawn on an offscreen surface as fast as possible, and
+events are scripted, so the same script always gives the same frames.
+"""
+
+import argparse
+import hashlib
+import os
+import sys
+
+
+class HeadlessDriver:
+    """Runs the scenes of the game without a window.
+
+    Each step is a frame of the game loop: the virtual clock moves
+    forward a frame, its timers and the scripted events are handed to
+    the scenes, then the current scene is drawn and updated. Tasks of
+    the debug scene run on the main thread, so they are done by the
+    next step.
+    """
+
+    FRAME_MILLIS = 1000 / 60
+
+    def __init__(self, initial_view: str = "game_intro",
+                 screen_size=None):
+        """Initialises the HeadlessDriver object.
+
+        Args:
+
+            initial_view:
+                The view shown first, "game_intro" or "main_menu".
+
+            screen_size:
+                The size of the offscreen surface. When None, the
+                size of the game window.
+        """
+
+        # SDL reads this when the display is initialised.
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+        import pygame
+        import pygame.event as pygame_event
+
+        from . import game
+        from .clock import VirtualClock
+
+        self.pygame = pygame
+        self.event = pygame_event
+        pygame.init()
+        # Images are converted to the pixel format of the display, so
+        # a display is needed, even if nothing is drawn on it.
+        if pygame.display.get_surface() is None:
+            pygame.display.set_mode((1, 1))
+        self.screen = pygame.Surface(screen_size or game.SCREEN_SIZE)
+        self.clock = VirtualClock()
+        self.scene_manager = game.setup_scenes(self.screen, self.clock,
+                                               initial_view)
+        self.frame = 0
+        self.pending = []
+        # Paths answered to the file dialogs of the debug scene.
+        self.files = []
+
+    @property
+    def scene(self):
+        """The current scene."""
+
+        return self.scene_manager.get(self.scene_manager.current_view)
+
+    def debug_scene(self):
+        """Returns the debug scene, set up to be driven."""
+
+        debug_scene = self.scene_manager.get("main_menu")
+        if not debug_scene.synchronous_tasks:
+            debug_scene.synchronous_tasks = True
+            # Driven runs leave the cache of the player alone.
+            debug_scene.cache_samples = False
+            debug_scene.choose_file = \
+                lambda title: self.files.pop(0) if self.files else None
+        return debug_scene
+
+    def post(self, event):
+        """Hands an event to the scenes in the next step."""
+
+        self.pending.append(event)
+
+    def click(self, position):
+        """Clicks with the left button at a position of the screen."""
+
+        self.post(self.event.Event(self.pygame.MOUSEBUTTONUP,
+                                   pos=position, button=1))
+
+    def press(self, key):
+        """Presses and releases a key."""
+
+        for event_type in (self.pygame.KEYDOWN, self.pygame.KEYUP):
+            self.post(self.event.Event(event_type, key=key, mod=0,
+                                       unicode="", scancode=0))
+
+    def load(self, index: int, path: str):
+        """Loads a sample in the debug scene, as if its load button
+        was clicked and path chosen.
+        """
+
+        debug_scene = self.debug_scene()
+        self.files.append(path)
+        button = (debug_scene.load_sample1_button,
+                  debug_scene.load_sample2_button)[index]
+        self.click(button.rect.center)
+
+    def match(self):
+        """Clicks the match button of the debug scene."""
+
+        self.click(self.debug_scene().match_button.rect.center)
+
+    def step(self):
+        """Runs a frame.
+
+        Returns:
+            The rects of the screen that changed, or None when it was
+            drawn whole.
+        """
+
+        events = [self.event.Event(event_type)
+                  for event_type in self.clock.advance(self.FRAME_MILLIS)]
+        events.extend(self.pending)
+        self.pending = []
+        # Events posted by the scenes themselves, like task results.
+        events.extend(self.event.get())
+        for event in events:
+            self.scene_manager.update_on_event(event)
+
+        dirty_rects = self.scene_manager.show()
+        self.scene_manager.update()
+        self.scene_manager.build_pending()
+        self.frame += 1
+        return dirty_rects
+
+    def run(self, frames: int, hashes: bool = False) -> list:
+        """Runs some frames.
+
+        Returns:
+            The hash of each frame when hashes is True, otherwise an
+            empty list.
+        """
+
+        frame_hashes = []
+        for _ in range(frames):
+            self.step()
+            if hashes:
+                frame_hashes.append(self.frame_hash())
+        return frame_hashes
+
+    def idle(self) -> bool:
+        """Returns whether the debug scene has no task running and no
+        event is waiting.
+        """
+
+        return self.debug_scene().task is None and not self.pending
+
+    def run_until(self, condition, max_frames: int = 10_000) -> bool:
+        """Runs frames until condition() is true.
+
+        Returns:
+            False if max_frames were run before it was.
+        """
+
+        for _ in range(max_frames):
+            if condition():
+                return True
+            self.step()
+        return condition()
+
+    def frame_hash(self) -> str:
+        """Returns the SHA-1 of the pixels of the current frame."""
+
+        return hashlib.sha1(
+            self.pygame.image.tobytes(self.screen, "RGB")).hexdigest()
+
+    def save_frame(self, path: str):
+        """Saves the current frame as an image."""
+
+        self.pygame.image.save(self.screen, path)
+
+    def close(self):
+        self.pygame.quit()
+
+
+def render_match(path1: str, path2: str, output: str, frames: int = 1):
+    """Loads two samples, matches them and saves the resulting frame.
+
+    Args:
+
+        path1, path2:
+            The samples.
+
+        output:
+            Where the image of the frame is saved.
+
+        frames:
+            The amount of frames run after matching, which moves the
+            helices.
+
+    Raises:
+        ValueError: if a sample is not a DNA sample.
+    """
+
+    driver = HeadlessDriver("main_menu")
+    try:
+        debug_scene = driver.debug_scene()
+        for index, path in enumerate((path1, path2)):
+            driver.load(index, path)
+            driver.run_until(driver.idle)
+            if debug_scene.dna_samples[index] is None:
+                raise ValueError(f"{path} is not a DNA sample.")
+
+        driver.match()
+        driver.run_until(driver.idle)
+        if debug_scene.estimated:
+            # Long samples are estimated first; matching again gives
+            # the exact score.
+            driver.match()
+            driver.run_until(driver.idle)
+        driver.run(frames)
+        driver.save_frame(output)
+    finally:
+        driver.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m dna_matcher.headless",
+        description="Render the match of two samples without a window.")
+    parser.add_argument("samples", nargs=2, help="the two samples")
+    parser.add_argument("-o", "--output", default="match.png",
+                        help="the image the match is saved to")
+    parser.add_argument("--frames", type=int, default=1,
+                        help="frames run after matching")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    """Command line entry of the headless renderer.
+
+    Returns:
+        The exit status.
+    """
+
+    args = parse_args(argv)
+    try:
+        render_match(*args.samples, args.output, args.frames)
+    except (OSError, ValueError) as error:
+        print(error, file=sys.stderr)
+        return 1
+    print(args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,6 +2,7 @@
 game interface.
 """
 
+import collections
 import os
 import textwrap
 
@@ -11,6 +12,19 @@ import pygame.mouse as mouse
 import pygame.sprite as sprite
 import pygame.surface as surface
 
+from .app.profiler import FRAME_BUDGET, profiler
+
+FONT_PATH = os.path.join("game_data", "fonts", "pixel.ttf")
+# Maximum amount of memory, in bytes, used by the rendered texts kept
+# by generate_text_surface.
+TEXT_CACHE_SIZE = 8 << 20
+
+# Fonts opened so far, by (path, size).
+_fonts = dict()
+# Rendered texts, least recently used first, and their total size.
+_text_surfaces = collections.OrderedDict()
+_text_cache_used = 0
+
 
 class Button(sprite.Sprite):
     """This class represents a interface button on a game. The button can have
@@ -179,10 +193,106 @@ class Label(sprite.Sprite):
         return text_label
 
 
+class ProfilerOverlay:
+    """A panel showing the percentiles of the spans timed by the
+    profiler, refreshed a couple of times per second.
+    """
+
+    # Seconds between refreshes of the panel.
+    REFRESH_INTERVAL = 0.5
+    TEXT_SIZE = 14
+    TEXT_COLOUR = (255, 255, 255)
+    OVER_BUDGET_COLOUR = (235, 52, 52)
+    BACKGROUND_COLOUR = (0, 0, 0)
+
+    def __init__(self, screen, names=("frame", "events", "draw", "animate",
+                                      "update", "display", "get_genome",
+                                      "match", "generate_text_surface")):
+        """Initialises the ProfilerOverlay object.
+
+        Args:
+
+            screen:
+                A Surface object representing the game window.
+
+            names:
+                The names of the spans shown, in order.
+        """
+
+        self.screen = screen
+        self.names = names
+        self.image = None
+        self.rect = None
+        self.refreshed = None
+
+    def render(self):
+        """Renders the panel with the current percentiles."""
+
+        text_font = get_font(FONT_PATH, self.TEXT_SIZE)
+        rows = [(["ms", "p50", "p95", "p99", "max"], self.TEXT_COLOUR)]
+        for name in self.names:
+            if name not in profiler.durations:
+                continue
+            values = profiler.percentiles(name)
+            colour = self.OVER_BUDGET_COLOUR \
+                if name == "frame" and values[1] > FRAME_BUDGET \
+                else self.TEXT_COLOUR
+            rows.append(([name] + [f"{value:.1f}" for value in values],
+                         colour))
+
+        # The font is not monospaced: the values are right aligned in
+        # columns.
+        name_width = max(text_font.size(cells[0])[0] for cells, _ in rows)
+        column_width = text_font.size(" 0000.0")[0]
+        line_height = text_font.get_linesize()
+        summary = text_font.render(
+            f"{profiler.over_budget()} frames over {FRAME_BUDGET:.1f} ms",
+            False, self.TEXT_COLOUR)
+        width = max(name_width + 4 * column_width, summary.get_width()) + 10
+        height = (len(rows) + 1) * line_height + 10
+        # The panel never shrinks, so it always covers what it drew
+        # before.
+        if self.rect is not None:
+            width = max(width, self.rect.width)
+            height = max(height, self.rect.height)
+        self.image = surface.Surface((width, height))
+        self.image.fill(self.BACKGROUND_COLOUR)
+        y = 5
+        for cells, colour in rows:
+            self.image.blit(text_font.render(cells[0], False, colour), (5, y))
+            for column, cell in enumerate(cells[1:], 1):
+                rendered = text_font.render(cell, False, colour)
+                self.image.blit(rendered, rendered.get_rect(
+                    topright=(5 + name_width + column * column_width, y)))
+            y += line_height
+        self.image.blit(summary, (5, y))
+        self.rect = self.image.get_rect(topleft=(10, 10))
+
+    def draw(self, now: float):
+        """Draws the panel, rendering it again when it is stale.
+
+        Returns:
+            The rect of the screen it covers.
+        """
+
+        if self.refreshed is None \
+                or now - self.refreshed >= self.REFRESH_INTERVAL:
+            self.render()
+            self.refreshed = now
+        self.screen.blit(self.image, self.rect)
+        return self.rect
+
+
+@profiler.timed("generate_text_surface")
 def generate_text_surface(text, colour, size, chars_per_line, y_padding,
                           bold=False, italic=False, antialised=False):
     """Generates a Surface object that contains a wrapped text.
 
+    Rendered texts are kept in a cache, least recently used ones being
+    dropped past TEXT_CACHE_SIZE bytes, so the same text is only
+    rendered once. The returned surface may be shared and must not be
+    drawn on.
+
     Args:
     
         text:
@@ -211,7 +321,16 @@ def generate_text_surface(text, colour, size, chars_per_line, y_padding,
         fact the rendered text.
     """
 
-    text_font = font.Font(os.path.join("game_data", "fonts", "pixel.ttf"), size)
+    global _text_cache_used
+
+    key = (text, tuple(colour), size, chars_per_line, y_padding, bold,
+           italic, antialised)
+    text_bg = _text_surfaces.get(key)
+    if text_bg is not None:
+        _text_surfaces.move_to_end(key)
+        return text_bg
+
+    text_font = get_font(FONT_PATH, size)
     rendered_paragraph = [
         text_font.render(phrase, antialised, colour)
         for phrase in textwrap.wrap(text, chars_per_line)
@@ -230,4 +349,37 @@ def generate_text_surface(text, colour, size, chars_per_line, y_padding,
         text_bg.blit(phrase, rect)
         row += text_font.get_height() + y_padding
 
+    _text_surfaces[key] = text_bg
+    _text_cache_used += _surface_size(text_bg)
+    while _text_cache_used > TEXT_CACHE_SIZE and len(_text_surfaces) > 1:
+        _, evicted = _text_surfaces.popitem(last=False)
+        _text_cache_used -= _surface_size(evicted)
     return text_bg
+
+
+def get_font(path, size):
+    """Returns the font at path with the given size, opening the file
+    only the first time it is asked for.
+    """
+
+    key = (path, size)
+    if key not in _fonts:
+        _fonts[key] = font.Font(path, size)
+    return _fonts[key]
+
+
+def clear_text_cache():
+    """Forgets every font and rendered text, for example after the
+    display is recreated.
+    """
+
+    global _text_cache_used
+
+    _fonts.clear()
+    _text_surfaces.clear()
+    _text_cache_used = 0
+
+
+def _surface_size(text_surface) -> int:
+    return text_surface.get_width() * text_surface.get_height() \
+        * text_surface.get_bytesize()
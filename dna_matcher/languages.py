@@ -9,7 +9,14 @@ message_map = {
         "matchit": "The samples have {}% of chance to being from the guy.",
         "load": "Select your sample",
         "loaded": "Ready and loaded",
-        "match_ready": "You are all free now"
+        "match_ready": "You are all free now",
+        "no_match": "The samples are not from the same guy.",
+        "estimate": "The samples look {}% alike. Match again for the exact score.",
+        "loading": "Loading... {}% (Esc cancels)",
+        "matching": "Matching... {}% (Esc cancels)",
+        "sketching": "Indexing... {}% (Esc cancels)",
+        "cancelled": "Cancelled",
+        "invalid": "That is not a DNA sample"
 
     },
     "pt_BR": {
@@ -18,14 +25,41 @@ message_map = {
         "matchit": "Há {}% de chance desses DNAs serem do alvo.",
         "load": "Selecione a sua amostra",
         "loaded": "Carregada",
-        "match_ready": "Tudo pronto para a análise"
+        "match_ready": "Tudo pronto para a análise",
+        "no_match": "Esses DNAs não são do mesmo alvo.",
+        "estimate": "Os DNAs parecem {}% iguais. Analise de novo para o valor exato.",
+        "loading": "Carregando... {}% (Esc cancela)",
+        "matching": "Analisando... {}% (Esc cancela)",
+        "sketching": "Indexando... {}% (Esc cancela)",
+        "cancelled": "Cancelado",
+        "invalid": "Isso não é uma amostra de DNA"
     } 
 }
 
 
+# Language of the messages when the system locale has none, like on
+# en_US or C locales.
+DEFAULT_LANGUAGE = "en_GB"
+
+
+def get_language(cur_locale: str = None) -> str:
+    """Returns the language of message_map used for a locale: the
+    locale itself, another variant of its language (en_US gets en_GB)
+    or DEFAULT_LANGUAGE.
+    """
+
+    if cur_locale in message_map:
+        return cur_locale
+    prefix = (cur_locale or "").split("_")[0] + "_"
+    for language in message_map:
+        if language.startswith(prefix):
+            return language
+    return DEFAULT_LANGUAGE
+
+
 def get_message(code: str) -> str:
     """Returns a message within a map according to the current system
-    locale.
+    locale (see get_language).
     
     Args:
         code: Key to the message.
@@ -38,4 +72,4 @@ def get_message(code: str) -> str:
 
     cur_locale = locale.getdefaultlocale()[0]
 
-    return message_map[cur_locale][code]
+    return message_map[get_language(cur_locale)][code]
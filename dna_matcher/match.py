@@ -0,0 +1,88 @@
+"""Headless DNA matcher.
+
+Usage: python -m dna_matcher.match a.moura b.moura [...]
+
+The first sample is matched against each one of the others (or every
+pair is matched, with --all). Nothing in here imports pygame.
+"""
+
+import argparse
+import itertools
+import json
+import sys
+
+from .app import engine
+from .app.sample import Sample
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m dna_matcher.match",
+        description="Match DNA samples without opening the game.")
+    parser.add_argument("samples", nargs="+", help="paths of the samples")
+    parser.add_argument("--all", action="store_true",
+                        help="match every pair of samples instead of the "
+                             "first one against the others")
+    parser.add_argument("--engine", choices=sorted(engine.ENGINES),
+                        default=None, help="the matching engine")
+    parser.add_argument("--threshold", type=float, default=None,
+                        help="report pairs below this ratio as not "
+                             "matching, without computing their score")
+    parser.add_argument("--estimate", action="store_true",
+                        help="only estimate the similarity from sketches")
+    parser.add_argument("--mode", choices=("stream", "mmap"),
+                        default="mmap", help="how the samples are loaded")
+    parser.add_argument("--json", action="store_true",
+                        help="print the results as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    """Command line entry of the headless matcher.
+
+    Returns:
+        The exit status.
+    """
+
+    args = parse_args(argv)
+    if len(args.samples) < 2:
+        print("At least two samples are needed.", file=sys.stderr)
+        return 2
+
+    samples = []
+    for path in args.samples:
+        try:
+            samples.append(Sample(path, args.mode))
+        except (OSError, ValueError) as error:
+            print(error, file=sys.stderr)
+            return 1
+
+    if args.all:
+        pairs = itertools.combinations(samples, 2)
+    else:
+        pairs = ((samples[0], sample) for sample in samples[1:])
+
+    results = []
+    for sample1, sample2 in pairs:
+        if args.estimate:
+            ratio = Sample.estimate(sample1, sample2)
+        else:
+            ratio = Sample.match(sample1, sample2, args.engine,
+                                 args.threshold)
+        results.append({
+            "sample1": sample1.file,
+            "sample2": sample2.file,
+            "ratio": ratio
+        })
+        if not args.json:
+            print(sample1.file, sample2.file,
+                  "-" if ratio is None else f"{ratio:.4f}", sep="\t")
+
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,24 +1,37 @@
+import threading
+import traceback
+
 import pygame.constants as constants
 import pygame.draw as draw
+import pygame.event as pygame_event
+import pygame.key as key
+import pygame.mouse as mouse
 import pygame.surface as surface
-import pygame.time as time
 
 from . import app, effects, interface, utils, languages
+from .clock import Clock
+from .app import align
+from .app.profiler import profiler
 
 
 class Scene:
     """A base object for the creation of scenes in a screen."""
 
-    def __init__(self, screen):
+    def __init__(self, screen, clock=None):
         """Initialises the Scene object.
 
         Args:
 
             screen:
                 The Surface object where this scene will be drawn.
+
+            clock:
+                The Clock driving the timers of the scene. When None,
+                the real one.
         """
 
         self.screen = screen
+        self.clock = clock if clock is not None else Clock()
         self.screen_rect = screen.get_rect()
 
         # This variable is only filled when this scene is added to a
@@ -38,7 +51,19 @@ class Scene:
             particles_group.update()
 
     def draw(self):
-        """It draws the components of this scene in the screen."""
+        """It draws the components of this scene in the screen.
+
+        Returns:
+            The list of rects of the screen that changed, or None when
+            the whole screen may have changed.
+        """
+
+        pass
+
+    def invalidate(self):
+        """Makes the next call to draw draw the whole scene, for
+        example after something else was drawn over it.
+        """
 
         pass
 
@@ -66,11 +91,45 @@ class DebugScene(Scene):
     used to debug new stuff.
     """
 
-    def __init__(self, screen):
-        super().__init__(screen)
-
+    # Samples less similar than this are reported as not matching.
+    # Unrelated random samples already score about 0.65, so it must be
+    # above that for "no match" to ever be reported.
+    MATCH_THRESHOLD = 0.75
+    # Samples longer than this (in bases, both together) are estimated
+    # from their sketches before being matched.
+    EXACT_MATCH_LIMIT = 1_000_000
+    # Samples longer than this are not aligned as a whole to show
+    # where they differ, only their shown bases are. Aligning takes
+    # about 0.4 s at this length and grows with its square.
+    ALIGN_LIMIT = 2_000
+    # Samples longer than this are matched with CANCELLABLE_ENGINE.
+    CANCELLABLE_MATCH_LIMIT = 100_000
+    CANCELLABLE_ENGINE = "bitparallel"
+    # Pixels scrolled by a step of the mouse wheel in the viewers.
+    SCROLL_PIXELS = 40
+
+    # Events posted by the worker thread.
+    LOAD_DONE = constants.USEREVENT + 2
+    MATCH_DONE = constants.USEREVENT + 3
+    TASK_PROGRESS = constants.USEREVENT + 4
+    TASK_CANCELLED = constants.USEREVENT + 5
+    FILE_CHOSEN = constants.USEREVENT + 6
+
+    # When True, only the parts of the screen that changed are drawn
+    # each frame.
+    DIRTY_RECTS = True
+
+    def __init__(self, screen, clock=None):
+        super().__init__(screen, clock)
+
+        # The background and the dividing lines never change, so they
+        # are drawn once.
         self.bg = surface.Surface(self.screen.get_size())
         self.bg.fill((20, 20, 20))
+        draw.line(self.bg, (0, 102, 255), (640, 0), (640, 600), width=4)
+        draw.line(self.bg, (0, 102, 255), (0, 600), (1280, 600), width=4)
+        draw.line(self.bg, (0, 102, 255), (360, 600), (360, 768), width=4)
+        draw.line(self.bg, (0, 102, 255), (870, 600), (870, 768), width=4)
 
         self.rect = self.bg.get_rect()
         self.rect.center = self.screen_rect.center
@@ -113,52 +172,310 @@ class DebugScene(Scene):
         self.match_label.rect.top = self.match_button.rect.bottom
         self.match_label.rect.y += 10
 
+        self.load_labels = [self.load_sample1_label, self.load_sample2_label]
+
         self.dna_samples = [None, None]
-    
+        # SampleCache of the loaded samples, created by the first load
+        # so nothing is written before. It can be set beforehand, or
+        # cache_samples set to False to load without one.
+        self.sample_cache = None
+        self.cache_samples = True
+        self.estimated = False
+
+        # Asks for the path of a sample to load. It runs on the worker
+        # thread, so it must not touch the main thread's toolkits.
+        self.choose_file = app.choose_file
+        # When True, tasks run on the main thread, so their results
+        # are posted before run_task returns.
+        self.synchronous_tasks = False
+        # CancelToken of the task running on the worker thread.
+        self.task = None
+        self.task_label = None
+        self.task_progress = None
+
+        # What each part looked like when it was last drawn.
+        self.drawn = dict()
+        self.full_redraw = True
+        # Whether the samples are shown by their viewers instead of
+        # their helices.
+        self.viewing = False
+
+    def run_task(self, label, function, *args):
+        """Runs a function on a worker thread, so the game loop keeps
+        running while it works. Only one task runs at a time, and it
+        can be cancelled with the Escape key.
+
+        Args:
+
+            label:
+                The label showing the progress of the task.
+
+            function:
+                Called with the CancelToken of the task and args. It
+                returns the type and attributes of the event posted
+                when it is done.
+
+        Returns:
+            False if another task is running.
+        """
+
+        if self.task is not None:
+            return False
+        self.task = app.CancelToken()
+        self.task_label = label
+        self.task_progress = None
+        if self.synchronous_tasks:
+            self._run_task(self.task, function, *args)
+            return True
+        thread = threading.Thread(target=self._run_task,
+                                  args=(self.task, function) + args,
+                                  daemon=True)
+        thread.start()
+        return True
+
+    @staticmethod
+    def _run_task(token, function, *args):
+        try:
+            event_type, attributes = function(token, *args)
+        except app.Cancelled:
+            event_type, attributes = DebugScene.TASK_CANCELLED, {}
+        except Exception:
+            # The scene must hear about the task ending either way.
+            traceback.print_exc()
+            event_type, attributes = DebugScene.TASK_CANCELLED, {}
+        pygame_event.post(
+            pygame_event.Event(event_type, attributes, token=token))
+
+    def post_progress(self, token, done, total, message="loading"):
+        """Reports the progress of a task. Called from its thread.
+
+        Args:
+
+            token:
+                The CancelToken of the task.
+
+            done, total:
+                How much of the task is done, out of total.
+
+            message:
+                The code of the message shown by the label of the
+                task. It is formatted with the percentage done.
+        """
+
+        percentage = done * 100 // total if total else 100
+        if percentage != self.task_progress:
+            self.task_progress = percentage
+            pygame_event.post(
+                pygame_event.Event(DebugScene.TASK_PROGRESS,
+                                   percentage=percentage, message=message,
+                                   token=token))
+
     def match_it(self):
         if not (None in self.dna_samples):
-            ratio = int(app.DNA.match(self.dna_samples[0], self.dna_samples[1])*100)
-            message = languages.get_message("matchit").format(ratio)
-            self.match_label.update_text(message)
+            if self.run_task(self.match_label, self._match,
+                             *self.dna_samples, self.estimated):
+                self.match_label.update_text(
+                    languages.get_message("matching").format(0))
         return
 
+    def _match(self, token, sample1, sample2, estimated):
+        """Matches the loaded samples. Runs on the worker thread."""
+
+        attributes = {"mismatches": None, "estimated": False}
+        size = len(sample1.genome) + len(sample2.genome)
+        if size > self.EXACT_MATCH_LIMIT and not estimated:
+            # Large samples get an instant estimate first; matching
+            # again computes the exact score.
+            similarity = app.DNA.estimate(sample1, sample2, token)
+            attributes["message"] = languages.get_message("estimate").format(int(similarity*100))
+            attributes["estimated"] = True
+        else:
+            # Large samples are matched by an engine that reports its
+            # progress and can be cancelled halfway.
+            engine_name = self.CANCELLABLE_ENGINE \
+                if size > self.CANCELLABLE_MATCH_LIMIT else None
+            ratio = app.DNA.match(
+                sample1, sample2, engine_name, self.MATCH_THRESHOLD,
+                lambda done, total: self.post_progress(token, done, total,
+                                                       "matching"),
+                token)
+            if ratio is None:
+                attributes["message"] = languages.get_message("no_match")
+            else:
+                attributes["message"] = languages.get_message("matchit").format(int(ratio*100))
+                attributes["mismatches"] = self.find_mismatches(
+                    sample1, sample2,
+                    lambda done, total: self.post_progress(
+                        token, done, total, "matching"),
+                    token)
+        return self.MATCH_DONE, attributes
+
+    def find_mismatches(self, sample1, sample2, progress=None, cancel=None):
+        """Aligns two samples so their helices show the rungs that
+        differ. Long samples only have their shown bases aligned, from
+        the offset each helix was scrolled to.
+
+        Args:
+
+            sample1, sample2:
+                The DNA objects to align.
+
+            progress, cancel:
+                Optional progress callback and CancelToken given to
+                align.align.
+
+        Returns:
+            The positions of each sample that differ.
+        """
+
+        if len(sample1.genome) + len(sample2.genome) <= self.ALIGN_LIMIT:
+            return align.mismatches(
+                app.DNA.align(sample1, sample2, progress, cancel))
+
+        offset1, offset2 = sample1.offset, sample2.offset
+        positions1, positions2 = align.mismatches(align.align(
+            sample1.genome[offset1:offset1 + sample1.rungs],
+            sample2.genome[offset2:offset2 + sample2.rungs],
+            progress, cancel))
+        return ({position + offset1 for position in positions1},
+                {position + offset2 for position in positions2})
+
+    def get_sample_cache(self):
+        """Returns the SampleCache given to the loaded samples, or None
+        when they are not cached.
+        """
+
+        if self.sample_cache is None and self.cache_samples:
+            self.sample_cache = app.SampleCache()
+        return self.sample_cache
 
     def load(self, x_boundaries, index):
-        path = app.fd(languages.get_message("load"))
-        if path is None:
+        """Asks for a sample on the worker thread; the sample is loaded
+        by another task once FILE_CHOSEN is posted (see chosen).
+        """
+
+        self.run_task(self.load_labels[index], self._choose, x_boundaries,
+                      index)
+
+    def _choose(self, token, x_boundaries, index):
+        """Shows the file dialog. Runs on the worker thread; the dialog
+        runs in a process of its own (see app.choose_file), so the game
+        keeps drawing while it is open.
+        """
+
+        path = self.choose_file(languages.get_message("load"))
+        token.check()
+        return self.FILE_CHOSEN, {"x_boundaries": x_boundaries,
+                                  "index": index, "path": path}
+
+    def chosen(self, x_boundaries, index, path):
+        """Loads the sample chosen in the file dialog, if any."""
+
+        if path:
+            self.run_task(self.load_labels[index], self._load, x_boundaries,
+                          index, path, self.get_sample_cache())
+
+    def _load(self, token, x_boundaries, index, path, cache):
+        """Loads and sketches a sample. Runs on the worker thread."""
+
+        attributes = {"index": index, "sample": None}
+        try:
+            sample = app.DNA(
+                self.screen, x_boundaries, path, "mmap", cache,
+                lambda done, total: self.post_progress(token, done, total),
+                token)
+        except (OSError, ValueError):
+            attributes["message"] = languages.get_message("invalid")
+            return self.LOAD_DONE, attributes
+        # The sketch is made here, with the rest of the loading, so the
+        # estimate of large samples is instant when matching.
+        sample.get_sketch(token, lambda done, total: self.post_progress(
+            token, done, total, "sketching"))
+        attributes["sample"] = sample
+        return self.LOAD_DONE, attributes
+
+    def finish_load(self, index, sample, message=None):
+        if message is not None:
+            self.load_labels[index].update_text(message)
+        if sample is None:
             return
-        self.dna_samples[index] = app.DNA(self.screen, x_boundaries, path)
 
-        if (not index):
-            self.load_sample1_label.update_text(languages.get_message("loaded"))
-        else:
-            self.load_sample2_label.update_text(languages.get_message("loaded"))
-        
+        self.dna_samples[index] = sample
+        for sample in self.dna_samples:
+            if sample is not None:
+                sample.mismatches = set()
+        self.estimated = False
+        self.load_labels[index].update_text(languages.get_message("loaded"))
+
         if self.dna_samples[0] and self.dna_samples[1]:
             self.match_label.update_text(languages.get_message("match_ready"))
 
-    def draw(self):
-        self.screen.blit(self.bg, self.rect)
-
-        # Dividing lines
-        draw.line(self.screen, (0, 102, 255), (640, 0), (640, 600), width=4)
-        draw.line(self.screen, (0, 102, 255), (0, 600), (1280, 600), width=4)
-        draw.line(self.screen, (0, 102, 255), (360, 600), (360, 768), width=4)
-        draw.line(self.screen, (0, 102, 255), (870, 600), (870, 768), width=4)
+    def finish_match(self, message, mismatches, estimated):
+        self.estimated = estimated
+        if mismatches is not None:
+            self.dna_samples[0].mismatches, self.dna_samples[1].mismatches = mismatches
+        self.match_label.update_text(message)
+
+    def parts(self):
+        """Returns the parts of the scene in drawing order, as (part,
+        look, area) tuples, area being the rect of the screen the part
+        draws on. A part changed since it was last drawn when its look
+        or its area did; a look of None means it always changes.
+        """
 
-        for dna in self.dna_samples:
-            try:
-                dna.draw()
-            except AttributeError:
-                continue
+        if self.viewing:
+            parts = [(dna.viewer, dna.viewer.look, dna.viewer.rect)
+                     for dna in self.dna_samples if dna is not None]
+        else:
+            parts = [(dna, None, dna.rect)
+                     for dna in self.dna_samples if dna is not None]
+        for label in (self.load_sample1_label, self.load_sample2_label,
+                      self.match_label):
+            parts.append((label, label.image, label.image.get_rect(
+                topleft=label.rect.topleft)))
+        for button in (self.load_sample1_button, self.load_sample2_button,
+                       self.match_button):
+            parts.append((button, button.current_sprite,
+                          button.current_sprite.get_rect(
+                              topleft=button.rect.topleft)))
+        return parts
+
+    def invalidate(self):
+        self.full_redraw = True
 
-        # Buttons and Labels drawning.
-        self.load_sample1_label.draw()
-        self.load_sample1_button.draw()
-        self.load_sample2_label.draw()
-        self.load_sample2_button.draw()
-        self.match_button.draw()
-        self.match_label.draw()
+    def draw(self):
+        parts = self.parts()
+        if self.full_redraw or not self.DIRTY_RECTS:
+            self.screen.blit(self.bg, self.rect)
+            for part, _, _ in parts:
+                part.draw()
+            self.drawn = {part: (look, area.copy())
+                          for part, look, area in parts}
+            self.full_redraw = False
+            return None
+
+        # The old and new areas of everything that changed.
+        dirty = []
+        drawn = dict()
+        for part, look, area in parts:
+            previous = self.drawn.pop(part, None)
+            drawn[part] = (look, area.copy())
+            if previous is None or look is None or previous != drawn[part]:
+                dirty.append(area.copy())
+                if previous is not None and previous[1] != area:
+                    dirty.append(previous[1])
+        # Parts that are gone, like a replaced sample.
+        dirty.extend(previous_area for _, previous_area in self.drawn.values())
+        self.drawn = drawn
+
+        for dirty_area in dirty:
+            self.screen.set_clip(dirty_area)
+            self.screen.blit(self.bg, self.rect)
+            for part, _, area in parts:
+                if area.colliderect(dirty_area):
+                    part.draw()
+        self.screen.set_clip(None)
+        return dirty
 
     def update(self):
         self.load_sample1_button.update()
@@ -176,14 +493,61 @@ class DebugScene(Scene):
         self.load_sample2_button.update_on_event(event)
         self.match_button.update_on_event(event)
 
+        if event.type == constants.KEYDOWN and event.key == constants.K_v:
+            self.viewing = not self.viewing
+            return
+        if event.type == constants.MOUSEWHEEL:
+            # The wheel scrolls the sample under the mouse along its
+            # genome, or zooms its viewer while Ctrl is held.
+            for sample in self.dna_samples:
+                if sample is None:
+                    continue
+                if not self.viewing:
+                    if sample.rect.collidepoint(mouse.get_pos()):
+                        sample.scroll(-event.y)
+                elif sample.viewer.rect.collidepoint(mouse.get_pos()):
+                    if key.get_mods() & constants.KMOD_CTRL:
+                        sample.viewer.zoom(2 ** event.y, mouse.get_pos()[0])
+                    else:
+                        sample.viewer.scroll(-event.y * self.SCROLL_PIXELS)
+            return
+        if event.type == constants.KEYDOWN and event.key == constants.K_ESCAPE:
+            if self.task is not None:
+                self.task.cancel()
+            return
+        if event.type not in (DebugScene.LOAD_DONE, DebugScene.MATCH_DONE,
+                              DebugScene.TASK_PROGRESS,
+                              DebugScene.TASK_CANCELLED,
+                              DebugScene.FILE_CHOSEN):
+            return
+        # Events of a task that is no longer running are stale.
+        if event.token is not self.task:
+            return
+
+        if event.type == DebugScene.TASK_PROGRESS:
+            self.task_label.update_text(
+                languages.get_message(event.message).format(event.percentage))
+            return
+        self.task = None
+        if event.type == DebugScene.FILE_CHOSEN:
+            self.chosen(event.x_boundaries, event.index, event.path)
+        elif event.type == DebugScene.LOAD_DONE:
+            self.finish_load(event.index, event.sample,
+                             getattr(event, "message", None))
+        elif event.type == DebugScene.MATCH_DONE:
+            self.finish_match(event.message, event.mismatches,
+                              event.estimated)
+        else:
+            self.task_label.update_text(languages.get_message("cancelled"))
+
 
 class IntroScene(Scene):
     """A scene that shows the logo of the creator of the game."""
 
     END_INTRO = constants.USEREVENT + 1
 
-    def __init__(self, screen):
-        super().__init__(screen)
+    def __init__(self, screen, clock=None):
+        super().__init__(screen, clock)
 
         self.logo_icon = interface.Label(
             screen, utils.load_image("game_intro/moura_cat.png"))
@@ -196,7 +560,12 @@ class IntroScene(Scene):
         self.logo_title.rect.centerx = self.screen_rect.centerx
         self.logo_title.rect.centery = self.screen_rect.centery + 74
 
-        time.set_timer(IntroScene.END_INTRO, 3000, 1)
+        self.clock.set_timer(IntroScene.END_INTRO, 3000, 1)
+
+    def update(self):
+        # The intro is idle for a while: a good time to build the
+        # next view.
+        self.scene_manager.preload("main_menu")
 
     def draw(self):
         self.screen.fill((255, 255, 255))
@@ -205,7 +574,6 @@ class IntroScene(Scene):
 
     def update_on_event(self, event):
         if event.type == IntroScene.END_INTRO:
-            print("changing view")
             self.scene_manager.change_view(
                 "main_menu",
                 effects.FadeTransition(
@@ -220,6 +588,10 @@ class SceneManager:
         """Initialises the scene manager object."""
 
         self.views = dict()
+        # Functions building the views that were not needed yet, and
+        # the views to build as soon as there is time.
+        self.factories = dict()
+        self.pending = []
         self.on_transition = False
         self.fx_object = None
         self.current_view = None
@@ -235,26 +607,70 @@ class SceneManager:
 
             scene_object:
                 A object that contains all the components to be drawn
-                on the screen.
+                on the screen, or a function returning it. A function
+                is only called when the view is first needed (see
+                get and preload).
+        """
+
+        if isinstance(scene_object, Scene):
+            scene_object.scene_manager = self
+            self.views[view_name] = scene_object
+        else:
+            self.factories[view_name] = scene_object
+
+    def get(self, view_name):
+        """Returns a view, building it if it was not yet."""
+
+        if view_name not in self.views:
+            self.add(view_name, self.factories.pop(view_name)())
+        return self.views[view_name]
+
+    def preload(self, view_name):
+        """Asks for a view to be built by build_pending, before it is
+        shown.
         """
 
-        scene_object.scene_manager = self
-        self.views[view_name] = scene_object
+        if view_name not in self.views and view_name not in self.pending:
+            self.pending.append(view_name)
+
+    def build_pending(self):
+        """Builds one of the views asked for by preload. Called after a
+        frame is shown, so the building happens while the game is idle.
+        """
+
+        while self.pending:
+            view_name = self.pending.pop(0)
+            if view_name not in self.views:
+                self.get(view_name)
+                return
 
     def show(self):
         """Shows the current view. This function may not have only
         one behavior
+
+        Returns:
+            The rects of the screen that changed, to be given to
+            pygame.display.update. None means the whole screen.
         """
 
-        self.views[self.current_view].draw()
+        view = self.get(self.current_view)
         if self.on_transition:
-            self.fx_object.animate()
+            # The transition draws over the whole view.
+            view.invalidate()
+            with profiler.span("draw"):
+                view.draw()
+            with profiler.span("animate"):
+                self.fx_object.animate()
+            return None
+        with profiler.span("draw"):
+            return view.draw()
 
     def update(self):
         """It updates the components of the current scene in loop."""
 
         if not self.on_transition:
-            self.views[self.current_view].update()
+            with profiler.span("update"):
+                self.get(self.current_view).update()
 
     def update_on_event(self, event):
         """It updates scenes based on events being read by the for
@@ -269,12 +685,13 @@ class SceneManager:
         """
 
         if not self.on_transition:
-            self.views[self.current_view].update_on_event(event)
+            self.get(self.current_view).update_on_event(event)
 
     def _change_view(self, view_name):
         """It changes the current view directly."""
 
         self.current_view = view_name
+        self.get(view_name).invalidate()
 
     def change_view(self, view_name, fx=None):
         """It changes the current scene with a special effect or
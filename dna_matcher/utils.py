@@ -3,12 +3,127 @@
 import os
 import functools
 
+import pygame.constants as constants
+import pygame.display as display
 import pygame.image as image
 import pygame.mixer as mixer
+import pygame.surface as surface
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".bmp")
+
+
+class Assets:
+    """Keeps the images of the game_data directory, each one loaded
+    once and converted to the pixel format of the display, so
+    blitting them needs no conversion.
+    """
+
+    def __init__(self, root="game_data"):
+        """Initialises the Assets object.
+
+        Args:
+
+            root:
+                The directory the paths of the images are relative
+                to.
+        """
+
+        self.root = root
+        self.images = dict()
+
+    def load(self, path):
+        """Returns the image at path, loading it the first time.
+
+        Images loaded before the display is created cannot be
+        converted, so they are not kept.
+        """
+
+        if path in self.images:
+            return self.images[path]
+
+        loaded = image.load(os.path.join(self.root, path))
+        if display.get_surface() is None:
+            return loaded
+        if loaded.get_flags() & constants.SRCALPHA:
+            loaded = loaded.convert_alpha()
+        else:
+            loaded = loaded.convert()
+        self.images[path] = loaded
+        return loaded
+
+    def preload(self, directory=""):
+        """Loads every image under a directory of the root.
+
+        Returns:
+            The paths of the images, relative to the root.
+        """
+
+        paths = []
+        for parent, _, files in os.walk(os.path.join(self.root, directory)):
+            for name in sorted(files):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    paths.append(os.path.relpath(os.path.join(parent, name),
+                                                 self.root))
+        for path in paths:
+            self.load(path)
+        return paths
+
+    def pack_atlas(self, paths):
+        """Packs some images in a single surface.
+
+        The images are placed in shelves, tallest first, and replaced
+        in the cache by subsurfaces of the atlas, so they are blitted
+        from a single block of memory. Images already handed out keep
+        working but are not part of the atlas.
+
+        Returns:
+            The atlas, or None when there are no images.
+        """
+
+        loaded = sorted(((self.load(path), path) for path in paths),
+                        key=lambda item: item[0].get_height(), reverse=True)
+        if not loaded:
+            return None
+
+        width = max(max(sprite.get_width() for sprite, _ in loaded),
+                    int(sum(sprite.get_width() * sprite.get_height()
+                            for sprite, _ in loaded) ** 0.5))
+        positions = []
+        x = y = shelf_height = 0
+        for sprite, _ in loaded:
+            if x + sprite.get_width() > width:
+                x, y = 0, y + shelf_height
+                shelf_height = 0
+            positions.append((x, y))
+            x += sprite.get_width()
+            shelf_height = max(shelf_height, sprite.get_height())
+
+        atlas = surface.Surface((width, y + shelf_height),
+                                constants.SRCALPHA)
+        if display.get_surface() is not None:
+            atlas = atlas.convert_alpha()
+        atlas.fill((0, 0, 0, 0))
+        for (sprite, path), position in zip(loaded, positions):
+            atlas.blit(sprite, position)
+            self.images[path] = atlas.subsurface(
+                sprite.get_rect(topleft=position))
+        return atlas
+
+    def clear(self):
+        """Forgets every image, for example after the display changed."""
+
+        self.images.clear()
+
+
+assets = Assets()
+
 
 def load_image(path):
     """Loads the image inside the game_data directory.
 
+    The image is cached by the assets object, so it is only decoded
+    once.
+
     Args:
 
         path:
@@ -16,7 +131,7 @@ def load_image(path):
             (game_data/)
     """
 
-    return image.load(os.path.join("game_data", path))
+    return assets.load(path)
 
 @functools.cache
 def load_soundfx(path):
@@ -0,0 +1,110 @@
+"""Tests of the matching engines against python-Levenshtein."""
+
+import random
+
+import pytest
+
+from dna_matcher.app import engine
+from dna_matcher.app.genome import PackedGenome
+from dna_matcher.app.sample import Sample
+
+lv = pytest.importorskip("Levenshtein")
+
+
+def random_bases(rng, length: int) -> bytes:
+    return bytes(rng.choice(b"ACGTN" if rng.random() < 0.1 else b"ACGT")
+                 for _ in range(length))
+
+
+def mutate(rng, bases: bytes, edits: int) -> bytes:
+    bases = bytearray(bases)
+    for _ in range(edits):
+        position = rng.randrange(len(bases) + 1)
+        kind = rng.randrange(3)
+        if kind == 0 or position == len(bases):
+            bases.insert(position, rng.choice(b"ACGTN"))
+        elif kind == 1:
+            del bases[position]
+        else:
+            bases[position] = rng.choice(b"ACGTN")
+    return bytes(bases)
+
+
+def genome_pairs():
+    rng = random.Random(1)
+    pairs = [(b"", b""), (b"", b"ACGT"), (b"NNNN", b"NNAN"),
+             (b"ACGTACGT", b"TGCATGCA")]
+    for length in (1, 7, 64, 300):
+        bases = random_bases(rng, length)
+        pairs.append((bases, mutate(rng, bases, rng.randrange(length + 1))))
+    # Longer than PROGRESS_ROWS, so the text is read in several chunks.
+    bases = random_bases(rng, engine.PROGRESS_ROWS + 500)
+    pairs.append((bases, mutate(rng, bases, 200)))
+    return [(PackedGenome.from_bases(a), PackedGenome.from_bases(b))
+            for a, b in pairs]
+
+
+def indel_distance(genome1, genome2) -> int:
+    return lv.distance(genome1.tobytes(), genome2.tobytes(),
+                       weights=(1, 1, 2))
+
+
+@pytest.mark.parametrize("name", sorted(engine.ENGINES))
+@pytest.mark.parametrize("genome1, genome2", genome_pairs())
+def test_ratio_matches_levenshtein(name, genome1, genome2):
+    ratio = engine.get_engine(name).ratio(genome1, genome2)
+    expected = lv.ratio(genome1.tobytes(), genome2.tobytes())
+    assert ratio == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("name", sorted(engine.ENGINES))
+@pytest.mark.parametrize("genome1, genome2", genome_pairs())
+def test_distance_matches_levenshtein(name, genome1, genome2):
+    distance = engine.get_engine(name).distance(genome1, genome2)
+    assert distance == lv.distance(genome1.tobytes(), genome2.tobytes())
+
+
+@pytest.mark.parametrize("name", sorted(engine.ENGINES))
+@pytest.mark.parametrize("genome1, genome2", genome_pairs()[:-1])
+def test_bounded_distance(name, genome1, genome2):
+    matching_engine = engine.get_engine(name)
+    expected = indel_distance(genome1, genome2)
+    for max_distance in {0, expected - 1, expected, expected + 5}:
+        if max_distance < 0:
+            continue
+        bounded = matching_engine.bounded_distance(genome1, genome2,
+                                                   max_distance)
+        # The banded default of MatchEngine gives the same answers.
+        banded = engine.MatchEngine.bounded_distance(
+            matching_engine, genome1, genome2, max_distance)
+        if expected <= max_distance:
+            assert bounded == banded == expected
+        else:
+            assert bounded is None and banded is None
+
+
+def test_engines_compare_slices():
+    rng = random.Random(2)
+    bases = random_bases(rng, 1000)
+    genome = PackedGenome.from_bases(bases)
+    other = PackedGenome.from_bases(mutate(rng, bases[3:501], 20))
+    expected = lv.distance(bases[3:501], other.tobytes())
+    for matching_engine in engine.ENGINES.values():
+        assert matching_engine.distance(genome[3:501], other) == expected
+
+
+def test_match_engine_is_abstract():
+    with pytest.raises(TypeError):
+        engine.MatchEngine()
+
+
+@pytest.mark.parametrize("name", sorted(engine.ENGINES))
+def test_match_at_threshold(name):
+    class _Sample:
+        def __init__(self, bases):
+            self.genome = PackedGenome.from_bases(bases)
+
+    # An indel distance of 2 over 10 bases is a ratio of exactly 0.8.
+    sample1, sample2 = _Sample(b"AAAAA"), _Sample(b"AAAAC")
+    assert Sample.match(sample1, sample2, name, 0.8) == pytest.approx(0.8)
+    assert Sample.match(sample1, sample2, name, 0.81) is None
@@ -0,0 +1,113 @@
+"""Tests of PackedGenome and the binary .moura format."""
+
+import random
+
+import pytest
+
+from dna_matcher.app import moura
+from dna_matcher.app.genome import MappedGenome, PackedGenome
+
+
+def random_bases(seed: int, length: int) -> bytes:
+    rng = random.Random(seed)
+    bases = bytearray(rng.choice(b"ACGT") for _ in range(length))
+    for _ in range(length // 50):
+        start = rng.randrange(length)
+        run = rng.randrange(1, 20)
+        bases[start:start + run] = b"N" * len(bases[start:start + run])
+    return bytes(bases)
+
+
+@pytest.mark.parametrize("length", [0, 1, 3, 4, 5, 1000, (1 << 16) + 7])
+def test_round_trip(length):
+    bases = random_bases(length, length)
+    genome = PackedGenome.from_bases(bases)
+    assert len(genome) == length
+    assert genome.tobytes() == bases
+    assert b"".join(genome.iter_chunks(333)) == bases
+
+
+def test_slicing():
+    bases = random_bases(1, 2000)
+    genome = PackedGenome.from_bases(bases)
+    rng = random.Random(1)
+    for _ in range(200):
+        start = rng.randrange(-100, 2100)
+        stop = rng.randrange(-100, 2100)
+        window = genome[start:stop]
+        assert window.tobytes() == bases[start:stop]
+        assert window.data is genome.data
+        inner_start = rng.randrange(len(window) + 1)
+        assert window[inner_start:].tobytes() == bases[start:stop][inner_start:]
+    assert genome[::3].tobytes() == bases[::3]
+    assert genome[5] == chr(bases[5])
+    assert genome[-1] == chr(bases[-1])
+    with pytest.raises(IndexError):
+        genome[len(bases)]
+
+
+def test_extend_in_pieces():
+    bases = random_bases(2, 3001)
+    genome = PackedGenome()
+    rng = random.Random(2)
+    position = 0
+    while position < len(bases):
+        size = rng.randrange(1, 40)
+        genome.extend(bases[position:position + size])
+        position += size
+    assert genome.tobytes() == bases
+    # Runs of N split between pieces are merged.
+    assert genome.gaps == PackedGenome.from_bases(bases).gaps
+
+
+def test_extend_slice_leaves_parent_alone():
+    bases = random_bases(3, 500)
+    genome = PackedGenome.from_bases(bases)
+    window = genome[101:203]
+    window.extend(b"NNACGT")
+    assert window.tobytes() == bases[101:203] + b"NNACGT"
+    assert genome.tobytes() == bases
+    genome.extend(b"TTNN")
+    assert genome.tobytes() == bases + b"TTNN"
+    assert window.tobytes() == bases[101:203] + b"NNACGT"
+
+
+def test_from_genome():
+    bases = random_bases(4, 10_000)
+    mapped = MappedGenome(bases, len(bases))
+    genome = PackedGenome.from_genome(mapped, chunk_size=777)
+    assert genome.tobytes() == bases
+    assert genome.gaps == PackedGenome.from_bases(bases).gaps
+
+
+@pytest.mark.parametrize("mapped", [True, False])
+def test_moura_round_trip(tmp_path, mapped):
+    bases = random_bases(5, 10_001)
+    path = str(tmp_path / "sample.moura")
+    # Small blocks, so runs of N go over the end of blocks.
+    moura.write_genome(path, PackedGenome.from_bases(bases), block_bases=64)
+    genome = moura.read_genome(path, mapped)
+    assert genome.tobytes() == bases
+    assert genome[1234:5678].tobytes() == bases[1234:5678]
+    assert genome.gaps == PackedGenome.from_bases(bases).gaps
+
+
+def test_moura_corrupted_block(tmp_path):
+    bases = random_bases(6, 1000)
+    path = tmp_path / "sample.moura"
+    moura.write_genome(str(path), PackedGenome.from_bases(bases),
+                       block_bases=64)
+    data = bytearray(path.read_bytes())
+    data[moura.HEADER_SIZE + 20] ^= 0xff
+    path.write_bytes(data)
+    with pytest.raises(ValueError):
+        moura.read_genome(str(path), mapped=False)
+    with pytest.raises(ValueError):
+        moura.read_genome(str(path), mapped=True, verify=True)
+
+
+def test_moura_bad_header(tmp_path):
+    path = tmp_path / "sample.moura"
+    path.write_bytes(moura.MAGIC + bytes(100))
+    with pytest.raises(ValueError):
+        moura.read_genome(str(path))
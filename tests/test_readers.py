@@ -0,0 +1,75 @@
+"""Tests of reading samples in the formats of readers.READERS."""
+
+import gzip
+
+import pytest
+
+from dna_matcher.app.sample import Sample
+
+BASES = b"ACGTNNNNACGTTGCAnnacgtRYACGTAAAAC"
+# What BASES are read as: upper case, ambiguous codes as N.
+EXPECTED = b"ACGTNNNNACGTTGCANNACGTNNACGTAAAAC"
+
+
+def wrap(bases: bytes, width: int, newline: bytes = b"\n") -> bytes:
+    return newline.join(bases[i:i + width]
+                        for i in range(0, len(bases), width)) + newline
+
+
+SAMPLES = {
+    "raw": BASES + b"\n",
+    "raw_crlf": wrap(BASES, 10, b"\r\n"),
+    "fasta": b">one\n" + wrap(BASES, 10),
+    "fasta_crlf": b">one\r\n" + wrap(BASES, 7, b"\r\n"),
+    "fasta_single_line": b">one\n" + BASES + b"\n",
+    "fasta_records": b">one\n" + wrap(BASES[:15], 5) + b">two\n"
+                     + wrap(BASES[15:], 5),
+    "fasta_no_newline": b">one\n" + wrap(BASES, 11)[:-1],
+    "fastq": b"@one\n" + BASES + b"\n+\n" + b"I" * len(BASES) + b"\n",
+    "fastq_crlf": b"@one\r\n" + BASES + b"\r\n+\r\n" + b"I" * len(BASES)
+                  + b"\r\n",
+}
+
+
+@pytest.fixture(params=sorted(SAMPLES))
+def sample_path(request, tmp_path):
+    path = tmp_path / f"{request.param}.txt"
+    path.write_bytes(SAMPLES[request.param])
+    return str(path)
+
+
+@pytest.mark.parametrize("mode", ["stream", "mmap"])
+def test_read_sample(sample_path, mode):
+    genome = Sample.get_genome(sample_path, mode)
+    assert genome.tobytes() == EXPECTED
+
+
+def test_read_gzip(tmp_path):
+    path = tmp_path / "sample.fa.gz"
+    path.write_bytes(gzip.compress(SAMPLES["fasta_crlf"]))
+    for mode in ("stream", "mmap"):
+        assert Sample.get_genome(str(path), mode).tobytes() == EXPECTED
+
+
+def test_n_runs(tmp_path):
+    bases = b"N" * 10 + b"ACGT" + b"N" * 7 + b"T" + b"n" * 5
+    path = tmp_path / "sample.fa"
+    path.write_bytes(b">runs\n" + wrap(bases, 6))
+    for mode in ("stream", "mmap"):
+        genome = Sample.get_genome(str(path), mode)
+        assert genome.tobytes() == bases.upper()
+        assert sum(genome.base_counts().values()) == len(bases) - 22
+        assert genome[2:12].tobytes() == b"NNNNNNNNAC"
+
+
+@pytest.mark.parametrize("data", [
+    b">one\nACGTX\n",
+    b"ACGT-ACGT\n",
+    b"@one\nACGT\n+\n",
+    b"@one\nACGT\nACGT\nIIII\n",
+])
+def test_invalid_samples(tmp_path, data):
+    path = tmp_path / "invalid.txt"
+    path.write_bytes(data)
+    for mode in ("stream", "mmap"):
+        assert Sample.get_genome(str(path), mode) is None